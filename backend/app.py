@@ -1,23 +1,90 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from model import get_model
+from prediction_store import create_store
+from uploads import MAX_DOCUMENT_BYTES, MAX_UPLOAD_BYTES, UploadError, read_upload
 from datetime import datetime
 import json
+import metrics
 import os
+import threading
+import time
 
 app = Flask(__name__)
 CORS(app)
 
-# Load model
+# Whole-request ceiling (batch uploads); single files are capped by MAX_UPLOAD_BYTES
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_REQUEST_BYTES', 256 * 2**20))
+
+# Room for multipart boundaries and small form fields around one file
+FORM_OVERHEAD = 64 * 1024
+
+# Load model (cheap: the CNN and torch are imported on first use)
 model = get_model()
 
-# In-memory storage for predictions (replace with database in production)
-predictions_store = []
+# Build the CNN off the request path when a CNN-backed mode needs it, so the
+# worker reports live immediately and ready once the network is loaded
+if model.require_cnn and model.cnn_trained:
+    threading.Thread(target=lambda: model.model, daemon=True).start()
+
+# Bounded prediction storage (PREDICTION_STORE=memory|sqlite)
+predictions_store = create_store()
+
+# Upper bound on files accepted by a single batch request
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', 500))
+
+# Request-level metrics, exported at /metrics (METRICS_ENABLED=0 disables them)
+REQUESTS = metrics.REGISTRY.counter('http_requests_total', 'HTTP requests by endpoint and status',
+                                    ('endpoint', 'status'))
+ERRORS = metrics.REGISTRY.counter('http_errors_total', 'Failed requests and failed predictions by endpoint',
+                                  ('endpoint', 'kind'))
+IN_FLIGHT = metrics.REGISTRY.gauge('http_requests_in_flight', 'Requests currently being handled', ('endpoint',))
+REQUEST_LATENCY = metrics.REGISTRY.histogram('http_request_duration_seconds', 'Request latency by endpoint',
+                                             ('endpoint',))
+
+if metrics.ENABLED:
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_endpoint = request.endpoint or 'unknown'
+        g.metrics_start = time.perf_counter()
+        IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+    @app.after_request
+    def record_request_metrics(response):
+        endpoint = g.get('metrics_endpoint', 'unknown')
+        if 'metrics_start' in g:
+            REQUEST_LATENCY.observe(time.perf_counter() - g.metrics_start, endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        if response.status_code >= 500:
+            ERRORS.inc(endpoint=endpoint, kind='server')
+        elif response.status_code >= 400:
+            ERRORS.inc(endpoint=endpoint, kind='client')
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        if 'metrics_endpoint' in g:
+            IN_FLIGHT.dec(endpoint=g.pop('metrics_endpoint'))
+
+def count_prediction_errors(predictions):
+    """Images that failed inside an otherwise successful request"""
+    failed = sum(1 for p in predictions if 'error' in p)
+    if failed and metrics.ENABLED:
+        ERRORS.inc(failed, endpoint=request.endpoint, kind='prediction')
+
+def request_mode():
+    """Prediction mode from the query string or form, defaulting to the model's"""
+    return request.args.get('mode') or request.form.get('mode') or model.prediction_mode
 
 @app.route('/predict', methods=['POST'])
 def predict():
     """Main prediction endpoint"""
     try:
+        # Reject oversized uploads from the header, before parsing the body
+        if (request.content_length or 0) > MAX_UPLOAD_BYTES + FORM_OVERHEAD:
+            return jsonify({'error': f'File too large (max {MAX_UPLOAD_BYTES} bytes)'}), 413
+        
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
         
@@ -26,20 +93,121 @@ def predict():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        # Read file bytes
-        file_bytes = file.read()
+        mode = request_mode()
+        if mode not in model.PREDICTION_MODES:
+            return jsonify({'error': f'Unknown mode: {mode}'}), 400
+        
+        # Read into one buffer, checking size and format as it streams in
+        file_bytes = read_upload(file.stream)
         
         # Get prediction
-        prediction = model.predict(file_bytes)
+        prediction = model.predict(file_bytes, mode)
         
         # Add metadata
         prediction['timestamp'] = datetime.now().isoformat()
         prediction['filename'] = file.filename
         
         # Store prediction
-        predictions_store.append(prediction)
+        predictions_store.add(prediction)
+        count_prediction_errors([prediction])
+        
+        with metrics.stage('serialize'):
+            return jsonify(prediction)
+    
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    except HTTPException as e:
+        return jsonify({'error': e.description}), e.code
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Batch prediction endpoint, one result per uploaded file in order"""
+    try:
+        files = [f for f in request.files.getlist('files') if f.filename != '']
+        
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+        
+        if len(files) > MAX_BATCH_FILES:
+            return jsonify({'error': f'Too many files (max {MAX_BATCH_FILES})'}), 400
+        
+        mode = request_mode()
+        if mode not in model.PREDICTION_MODES:
+            return jsonify({'error': f'Unknown mode: {mode}'}), 400
+        
+        # Rejected uploads and failed images come back as error entries in their slot
+        predictions = [None] * len(files)
+        uploads = []
+        for index, f in enumerate(files):
+            try:
+                uploads.append((index, read_upload(f.stream)))
+            except UploadError as e:
+                predictions[index] = model.error_prediction(f'{f.filename}: {e}')
+        if uploads:
+            for (index, _), prediction in zip(uploads, model.predict_batch([data for _, data in uploads], mode)):
+                predictions[index] = prediction
+        
+        timestamp = datetime.now().isoformat()
+        for file, prediction in zip(files, predictions):
+            prediction['timestamp'] = timestamp
+            prediction['filename'] = file.filename
+            predictions_store.add(prediction)
+        
+        count_prediction_errors(predictions)
+        
+        with metrics.stage('serialize'):
+            return jsonify({
+                'results': predictions,
+                'count': len(predictions),
+                'errors': sum(1 for p in predictions if 'error' in p)
+            })
+    
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    except HTTPException as e:
+        return jsonify({'error': e.description}), e.code
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/document', methods=['POST'])
+def predict_document():
+    """Tiled prediction for large or multi-page scans, with a per-page breakdown"""
+    try:
+        if (request.content_length or 0) > MAX_DOCUMENT_BYTES + FORM_OVERHEAD:
+            return jsonify({'error': f'File too large (max {MAX_DOCUMENT_BYTES} bytes)'}), 413
+        
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        file_bytes = read_upload(file.stream, MAX_DOCUMENT_BYTES)
+        
+        prediction = model.predict_document(file_bytes)
+        
+        prediction['timestamp'] = datetime.now().isoformat()
+        prediction['filename'] = file.filename
         
-        return jsonify(prediction)
+        predictions_store.add(prediction)
+        count_prediction_errors([prediction])
+        
+        with metrics.stage('serialize'):
+            return jsonify(prediction)
+    
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    except HTTPException as e:
+        return jsonify({'error': e.description}), e.code
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -48,36 +216,46 @@ def predict():
 def get_history():
     """Get prediction history"""
     limit = request.args.get('limit', 50, type=int)
-    return jsonify(predictions_store[-limit:])
+    return jsonify(predictions_store.recent(limit))
 
 @app.route('/stats', methods=['GET'])
 def get_stats():
     """Get statistics about predictions"""
-    if not predictions_store:
-        return jsonify({
-            'total_predictions': 0,
-            'behavior_distribution': {},
-            'average_confidence': 0
-        })
-    
-    behavior_counts = {}
-    total_confidence = 0
-    
-    for pred in predictions_store:
-        behavior = pred.get('behavior', 'Unknown')
-        behavior_counts[behavior] = behavior_counts.get(behavior, 0) + 1
-        total_confidence += pred.get('confidence', 0)
-    
-    return jsonify({
-        'total_predictions': len(predictions_store),
-        'behavior_distribution': behavior_counts,
-        'average_confidence': total_confidence / len(predictions_store) if predictions_store else 0
-    })
+    stats = predictions_store.stats()
+    stats['cache'] = model.cache.stats()
+    return jsonify(stats)
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'model_loaded': model is not None})
+    return jsonify({
+        'status': 'healthy',
+        'ready': model.is_ready(),
+        'model_loaded': model is not None,
+        'cnn_loaded': model.cnn_loaded,
+        'cnn_trained': model.cnn_trained,
+        'cnn_artifact': model.loaded_artifact,
+        'prediction_mode': model.prediction_mode,
+        'cnn_batching': model.batcher_stats(),
+        'cache': model.cache.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint: request, error, in-flight and stage latency metrics"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: every model the configured mode needs is loaded"""
+    ready = model.is_ready()
+    return jsonify({'ready': ready, 'cnn_loaded': model.cnn_loaded, 'cnn_trained': model.cnn_trained}), \
+        200 if ready else 503
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,220 @@
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from model import get_model
+from prediction_cache import content_hash
+from prediction_store import create_store
+from uploads import MAX_UPLOAD_BYTES, UploadError, read_upload
+from contextlib import asynccontextmanager
+from datetime import datetime
+import asyncio
+import os
+import threading
+
+# Async serving entry point for the same API as app.py:
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+# Decoding and feature extraction run in a process pool; at most
+# MAX_INFLIGHT predictions are admitted at once and the rest are rejected
+# immediately with 503 instead of queueing behind them.
+
+# Room for multipart boundaries and small form fields around one file
+FORM_OVERHEAD = 64 * 1024
+
+WORKERS = int(os.environ.get('ASGI_WORKERS', 0)) or os.cpu_count() or 1
+MAX_INFLIGHT = int(os.environ.get('ASGI_MAX_INFLIGHT', 0)) or WORKERS * 2
+
+# Front-end model: cheap (no CNN until used), owns the cache and modes
+model = get_model()
+predictions_store = create_store()
+
+_pool = None
+_pool_lock = threading.Lock()
+_inflight = 0
+_counters = {'accepted': 0, 'rejected': 0}
+
+def _predict_in_worker(image_bytes, mode):
+    """Process-pool entry point: each worker keeps its own model instance"""
+    return get_model().predict(image_bytes, mode)
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=WORKERS)
+    return _pool
+
+def _discard_pool(pool):
+    """Drop a broken pool (a worker died) so the next call starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _pool_usable():
+    # The executor flags itself broken as soon as it notices a dead worker
+    return _pool is not None and not getattr(_pool, '_broken', False)
+
+def _read_and_lookup(stream, mode):
+    """Buffer an upload, hash it and check the cache; blocking (may hit disk), so it runs off the event loop"""
+    file_bytes = read_upload(stream)
+    image_hash = content_hash(file_bytes)
+    return file_bytes, image_hash, model.cache_lookup(image_hash, mode)
+
+async def _predict_in_pool(file_bytes, mode):
+    """Run a prediction in the pool, replacing the pool and retrying once if a worker died"""
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return await loop.run_in_executor(pool, _predict_in_worker, file_bytes, mode)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            if attempt:
+                raise
+
+def _overloaded():
+    return JSONResponse(
+        {'error': 'Server busy, retry shortly', 'inflight': _inflight, 'max_inflight': MAX_INFLIGHT},
+        status_code=503,
+        headers={'Retry-After': '1'}
+    )
+
+async def predict(request):
+    """Main prediction endpoint"""
+    global _inflight
+    # Shed load before spending time receiving and parsing the upload
+    if _inflight >= MAX_INFLIGHT:
+        _counters['rejected'] += 1
+        return _overloaded()
+
+    try:
+        content_length = request.headers.get('content-length')
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + FORM_OVERHEAD:
+            return JSONResponse({'error': f'File too large (max {MAX_UPLOAD_BYTES} bytes)'}, status_code=413)
+
+        form = await request.form()
+        file = form.get('file')
+
+        if file is None or isinstance(file, str):
+            return JSONResponse({'error': 'No file provided'}, status_code=400)
+
+        if file.filename == '':
+            return JSONResponse({'error': 'No file selected'}, status_code=400)
+
+        mode = request.query_params.get('mode') or form.get('mode') or model.prediction_mode
+        if mode not in model.PREDICTION_MODES:
+            return JSONResponse({'error': f'Unknown mode: {mode}'}, status_code=400)
+
+        # Read into one buffer, checking size and format, hash it and look it up in a thread;
+        # cache hits never touch the pool
+        file_bytes, image_hash, prediction = await run_in_threadpool(_read_and_lookup, file.file, mode)
+
+        if prediction is None:
+            # Admission control: fail fast instead of growing latency
+            if _inflight >= MAX_INFLIGHT:
+                _counters['rejected'] += 1
+                return _overloaded()
+            _inflight += 1
+            _counters['accepted'] += 1
+            try:
+                prediction = await _predict_in_pool(file_bytes, mode)
+            finally:
+                _inflight -= 1
+            if 'error' not in prediction:
+                await run_in_threadpool(model.cache_store, image_hash, mode, prediction)
+
+        # Add metadata
+        prediction['timestamp'] = datetime.now().isoformat()
+        prediction['filename'] = file.filename
+
+        # Store prediction
+        predictions_store.add(prediction)
+
+        return JSONResponse(prediction)
+
+    except UploadError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status)
+
+    except BrokenProcessPool:
+        # A worker died again on the retry; the pool is replaced on the next request
+        return JSONResponse({'error': 'Worker process died, retry shortly'}, status_code=503,
+                            headers={'Retry-After': '1'})
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def get_history(request):
+    """Get prediction history"""
+    try:
+        limit = int(request.query_params.get('limit', 50))
+    except ValueError:
+        limit = 50
+    return JSONResponse(predictions_store.recent(limit))
+
+async def get_stats(request):
+    """Get statistics about predictions"""
+    stats = predictions_store.stats()
+    stats['cache'] = model.cache.stats()
+    return JSONResponse(stats)
+
+async def health(request):
+    """Health check endpoint"""
+    return JSONResponse({
+        'status': 'healthy',
+        'ready': _pool_usable(),
+        'model_loaded': model is not None,
+        'workers': WORKERS,
+        'inflight': _inflight,
+        'max_inflight': MAX_INFLIGHT,
+        'admission': dict(_counters),
+        'cnn_trained': model.cnn_trained,
+        'cache': model.cache.stats()
+    })
+
+async def liveness(request):
+    """Liveness probe: the event loop is up and serving requests"""
+    return JSONResponse({'status': 'alive'})
+
+async def readiness(request):
+    """Readiness probe: the worker pool is running (workers load their own models) and,
+    when a CNN-backed mode is required, trained weights are configured"""
+    pool_ready = _pool_usable()
+    if not pool_ready and _pool is not None:
+        # Replace a broken pool now instead of on the next prediction
+        _discard_pool(_pool)
+        _get_pool()
+    ready = pool_ready and (model.cnn_trained or not model.require_cnn)
+    return JSONResponse({'ready': ready, 'workers': WORKERS, 'cnn_trained': model.cnn_trained},
+                        status_code=200 if ready else 503)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Start the workers before the first request arrives
+    _get_pool()
+    yield
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+app = Starlette(
+    routes=[
+        Route('/predict', predict, methods=['POST']),
+        Route('/history', get_history, methods=['GET']),
+        Route('/stats', get_stats, methods=['GET']),
+        Route('/health', health, methods=['GET']),
+        Route('/health/live', liveness, methods=['GET']),
+        Route('/health/ready', readiness, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
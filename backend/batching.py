@@ -0,0 +1,69 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class MicroBatcher:
+    """Dynamic batching scheduler for model inference.
+
+    Callers submit single items from any thread and get a Future back. A
+    background thread groups queued items until either `max_batch_size`
+    items are waiting or `max_wait_ms` has passed since the first one
+    arrived, runs them through `run_batch` in one call and hands each
+    caller its own result.
+    """
+
+    def __init__(self, run_batch, max_batch_size=16, max_wait_ms=5.0):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._counters = {'batches': 0, 'items': 0, 'max_batch_seen': 0}
+        self._thread = threading.Thread(target=self._loop, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue one item for the next batch"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        """Submit an item and wait for its result"""
+        return self.submit(item).result()
+
+    def stats(self):
+        counters = dict(self._counters)
+        counters['average_batch_size'] = counters['items'] / counters['batches'] if counters['batches'] else 0
+        return counters
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or the deadline passes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = self.run_batch(items)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+            self._counters['batches'] += 1
+            self._counters['items'] += len(batch)
+            self._counters['max_batch_seen'] = max(self._counters['max_batch_seen'], len(batch))
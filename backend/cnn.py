@@ -0,0 +1,131 @@
+import json
+import os
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+# CNN Model Architecture
+class HandwritingBehaviorCNN(nn.Module):
+    def __init__(self):
+        super(HandwritingBehaviorCNN, self).__init__()
+        self.conv1 = nn.Conv2d(1, 32, kernel_size=3, padding=1)
+        self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
+        self.conv3 = nn.Conv2d(64, 128, kernel_size=3, padding=1)
+        self.pool = nn.MaxPool2d(2, 2)
+        self.fc1 = nn.Linear(128 * 28 * 28, 256)
+        self.fc2 = nn.Linear(256, 128)
+        self.fc3 = nn.Linear(128, 5)  # 5 behavior classes
+        self.dropout = nn.Dropout(0.5)
+
+    def forward(self, x):
+        x = self.pool(F.relu(self.conv1(x)))
+        x = self.pool(F.relu(self.conv2(x)))
+        x = self.pool(F.relu(self.conv3(x)))
+        x = x.view(-1, 128 * 28 * 28)
+        x = F.relu(self.fc1(x))
+        x = self.dropout(x)
+        x = F.relu(self.fc2(x))
+        x = self.dropout(x)
+        x = self.fc3(x)
+        return x
+
+class CompactHandwritingCNN(nn.Module):
+    """Compact variant: the same conv stack followed by global average pooling.
+
+    Replacing the 128*28*28 -> 256 projection with pooling drops the
+    parameter count by two orders of magnitude and removes the fixed
+    224x224 input requirement.
+    """
+
+    def __init__(self):
+        super(CompactHandwritingCNN, self).__init__()
+        self.conv1 = nn.Conv2d(1, 32, kernel_size=3, padding=1)
+        self.bn1 = nn.BatchNorm2d(32)
+        self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
+        self.bn2 = nn.BatchNorm2d(64)
+        self.conv3 = nn.Conv2d(64, 128, kernel_size=3, padding=1)
+        self.bn3 = nn.BatchNorm2d(128)
+        self.pool = nn.MaxPool2d(2, 2)
+        self.gap = nn.AdaptiveAvgPool2d(1)
+        self.fc1 = nn.Linear(128, 64)
+        self.fc2 = nn.Linear(64, 5)  # 5 behavior classes
+        self.dropout = nn.Dropout(0.3)
+
+    def forward(self, x):
+        x = self.pool(F.relu(self.bn1(self.conv1(x))))
+        x = self.pool(F.relu(self.bn2(self.conv2(x))))
+        x = self.pool(F.relu(self.bn3(self.conv3(x))))
+        x = torch.flatten(self.gap(x), 1)
+        x = F.relu(self.fc1(x))
+        x = self.dropout(x)
+        x = self.fc2(x)
+        return x
+
+# Architecture registry: name -> (class, default input size)
+ARCHITECTURES = {
+    'baseline': (HandwritingBehaviorCNN, 224),
+    'compact': (CompactHandwritingCNN, 128),
+}
+
+def build_model(arch='baseline'):
+    """Instantiate a registered architecture"""
+    if arch not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture: {arch} (choose from {', '.join(ARCHITECTURES)})")
+    return ARCHITECTURES[arch][0]()
+
+def default_input_size(arch):
+    return ARCHITECTURES[arch][1]
+
+def save_checkpoint(model, path, arch, input_size=None, **extra):
+    """Save weights together with the architecture and input size they belong to"""
+    checkpoint = {
+        'arch': arch,
+        'input_size': input_size or default_input_size(arch),
+        'state_dict': model.state_dict(),
+    }
+    checkpoint.update(extra)
+    torch.save(checkpoint, path)
+
+def load_checkpoint(path, map_location='cpu'):
+    """Load a checkpoint, returning (arch, input_size, state_dict).
+
+    Bare state_dicts written before the registry existed are treated as
+    the baseline architecture.
+    """
+    checkpoint = torch.load(path, map_location=map_location)
+    if isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
+        arch = checkpoint.get('arch', 'baseline')
+        return arch, checkpoint.get('input_size', default_input_size(arch)), checkpoint['state_dict']
+    return 'baseline', default_input_size('baseline'), checkpoint
+
+def artifact_paths(checkpoint_path):
+    """Locations of the exported CPU artifacts for a checkpoint"""
+    stem = os.path.splitext(checkpoint_path)[0]
+    return {
+        'torchscript': f'{stem}.ts.pt',
+        'int8': f'{stem}.int8.pt',
+        'report': f'{stem}.export.json',
+    }
+
+def load_artifact(checkpoint_path, preference='auto'):
+    """Load an exported TorchScript artifact for a checkpoint if one is usable.
+
+    `preference` is 'auto' (INT8, then fp32 TorchScript), 'int8',
+    'torchscript' or 'eager'. Artifacts older than the checkpoint are
+    ignored. Returns (module, arch, input_size, kind) or None.
+    """
+    if preference == 'eager':
+        return None
+    kinds = ('int8', 'torchscript') if preference == 'auto' else (preference,)
+    paths = artifact_paths(checkpoint_path)
+    checkpoint_mtime = os.path.getmtime(checkpoint_path) if os.path.exists(checkpoint_path) else 0
+    for kind in kinds:
+        path = paths[kind]
+        if not os.path.exists(path) or os.path.getmtime(path) < checkpoint_mtime:
+            continue
+        extra_files = {'meta.json': ''}
+        module = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+        meta = json.loads(extra_files['meta.json'] or '{}')
+        arch = meta.get('arch', 'baseline')
+        return module.eval(), arch, meta.get('input_size', default_input_size(arch)), kind
+    return None
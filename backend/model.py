@@ -1,61 +1,106 @@
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
-from torchvision import transforms
 import cv2
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageSequence, TiffImagePlugin, TiffTags
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from prediction_cache import PredictionCache, content_hash
+from batching import MicroBatcher
+import metrics
+import hashlib
 import io
+import json
+import os
+import threading
 
-# CNN Model Architecture
-class HandwritingBehaviorCNN(nn.Module):
-    def __init__(self):
-        super(HandwritingBehaviorCNN, self).__init__()
-        self.conv1 = nn.Conv2d(1, 32, kernel_size=3, padding=1)
-        self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
-        self.conv3 = nn.Conv2d(64, 128, kernel_size=3, padding=1)
-        self.pool = nn.MaxPool2d(2, 2)
-        self.fc1 = nn.Linear(128 * 28 * 28, 256)
-        self.fc2 = nn.Linear(256, 128)
-        self.fc3 = nn.Linear(128, 5)  # 5 behavior classes
-        self.dropout = nn.Dropout(0.5)
-
-    def forward(self, x):
-        x = self.pool(F.relu(self.conv1(x)))
-        x = self.pool(F.relu(self.conv2(x)))
-        x = self.pool(F.relu(self.conv3(x)))
-        x = x.view(-1, 128 * 28 * 28)
-        x = F.relu(self.fc1(x))
-        x = self.dropout(x)
-        x = F.relu(self.fc2(x))
-        x = self.dropout(x)
-        x = self.fc3(x)
-        return x
+# torch/torchvision and the CNN are imported on first use only, so workers
+# that serve rule-based predictions never pay for them
+def __getattr__(name):
+    if name == 'HandwritingBehaviorCNN':
+        from cnn import HandwritingBehaviorCNN
+        return HandwritingBehaviorCNN
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Feature Extraction
 class HandwritingFeatureExtractor:
-    def __init__(self):
+    # projection: sheared projection profiles of the ink mask
+    # hough_vertical: Canny + full-image HoughLines, as a lean from vertical
+    # hough: the original Canny + full-image HoughLines estimator, unchanged
+    SLANT_METHODS = ('projection', 'hough_vertical', 'hough')
+    # Estimators that read edges of the grayscale image instead of the ink mask
+    SLANT_GRAY_METHODS = ('hough_vertical', 'hough')
+
+    # Bumped when an estimator's output changes, so cached predictions are invalidated
+    FEATURES_VERSION = 4
+
+    # Slant search range and resolution, in degrees from vertical
+    SLANT_RANGE = 45
+    SLANT_COARSE_STEP = 2.0
+    SLANT_FINE_STEP = 0.25
+
+    # Slant is scale invariant, so estimators work on a small copy of the mask
+    SLANT_MAX_SIDE = 384
+    SLANT_MAX_POINTS = 12000
+    SLANT_MIN_POINTS = 50
+    # Share of a downscaled mask pixel (of 255) that must be ink
+    SLANT_MIN_COVERAGE = 64
+    # Projection profiles are scored per horizontal band of the downscaled mask
+    SLANT_BAND_HEIGHT = 16
+
+    # Auto-crop finds ink on a grid of AUTOCROP_BLOCK-pixel blocks
+    AUTOCROP_BLOCK = 8
+
+    def __init__(self, threshold=128, slant_method=None, autocrop=None, autocrop_padding=16):
         self.behavior_classes = ['Calm', 'Stressed', 'Angry', 'Focused', 'Happy']
+        self.threshold = threshold
+        self.slant_method = slant_method or os.environ.get('SLANT_METHOD', 'projection')
+        if self.slant_method not in self.SLANT_METHODS:
+            raise ValueError(f"Unknown slant method: {self.slant_method}")
+        # Crop blank margins before extraction (changes stroke width and pressure)
+        self.autocrop = autocrop if autocrop is not None else os.environ.get('AUTOCROP', '0') == '1'
+        self.autocrop_padding = autocrop_padding
+
+    def extract_features(self, image_array, scale=1.0):
+        """Extract handwriting characteristics from image.
+
+        Fused engine: the image is binarized once and the resulting uint8
+        ink mask is shared by letter size, stroke width and spacing, while
+        stroke width and pressure are computed with integer reductions
+        instead of float copies of the image.
+
+        `scale` is the ratio of the original to the working resolution when
+        the image was downscaled on decode; pixel-length features (letter
+        size, spacing) are reported in original-resolution pixels so they do
+        not depend on the working resolution.
+        """
+        gray = self._to_gray(image_array)
+        if self.autocrop:
+            with metrics.stage('autocrop'):
+                gray = self.crop_to_ink(gray)
+
+        # Binarize once; every remaining stage reads this buffer
+        with metrics.stage('binarize'):
+            _, ink = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY_INV)
+
+        with metrics.stage('slant'):
+            slant_angle = self._slant_from_gray(gray) if self.slant_method in self.SLANT_GRAY_METHODS \
+                else self._slant_from_mask(ink)
+
+        with metrics.stage('stroke_pressure'):
+            # Stroke width: share of ink pixels
+            stroke_width = float(cv2.countNonZero(ink) / gray.size * 100) if gray.size > 0 else 0
+
+            # Pressure: mean intensity from an exact integer sum
+            intensity_sum = int(np.sum(gray, dtype=np.uint64))
+            pressure = float(intensity_sum / (255 * gray.size) * 100) if gray.size > 0 else 0
+
+        # Spacing reads the mask before contour tracing touches it
+        with metrics.stage('spacing'):
+            spacing = self._spacing_from_mask(ink, scale)
+        with metrics.stage('letter_size'):
+            letter_size = self._letter_size_from_mask(ink, min_height=5 / scale) * scale
 
-    def extract_features(self, image_array):
-        """Extract handwriting characteristics from image"""
-        gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY) if len(image_array.shape) == 3 else image_array
-        
-        # Calculate slant angle
-        slant_angle = self._calculate_slant_angle(gray)
-        
-        # Calculate letter size
-        letter_size = self._calculate_letter_size(gray)
-        
-        # Calculate stroke width
-        stroke_width = self._calculate_stroke_width(gray)
-        
-        # Calculate pressure (based on pixel intensity)
-        pressure = self._calculate_pressure(gray)
-        
-        # Calculate spacing (letter spacing consistency)
-        spacing = self._calculate_spacing(gray)
-        
         return {
             'slant_angle': slant_angle,
             'letter_size': letter_size,
@@ -64,8 +109,339 @@ class HandwritingFeatureExtractor:
             'spacing': spacing
         }
 
+    def extract_features_staged(self, image_array):
+        """Extract features with the independent per-stage methods (reference path)"""
+        gray = self._to_gray(image_array)
+        if self.autocrop:
+            gray = self.crop_to_ink(gray)
+
+        return {
+            'slant_angle': self._calculate_slant_angle(gray),
+            'letter_size': self._calculate_letter_size(gray),
+            'stroke_width': self._calculate_stroke_width(gray),
+            'pressure': self._calculate_pressure(gray),
+            'spacing': self._calculate_spacing(gray)
+        }
+
+    def tile_stats(self, gray, core, overlap=128):
+        """Mergeable feature statistics for one tile of a page.
+
+        `core` is the (x0, y0, x1, y1) region the tile owns. Ink, intensity
+        and column-ink statistics cover the core only, so tiles never count
+        a pixel twice. Contours are traced on the core grown by `overlap`,
+        and a letter is counted only by the tile owning its top-left
+        corner, so letters up to `overlap` pixels tall are measured whole.
+        """
+        x0, y0, x1, y1 = core
+        height, width = gray.shape
+        ex0, ey0 = max(0, x0 - overlap), max(0, y0 - overlap)
+        ex1, ey1 = min(width, x1 + overlap), min(height, y1 + overlap)
+        _, ink = cv2.threshold(gray[ey0:ey1, ex0:ex1], self.threshold, 255, cv2.THRESH_BINARY_INV)
+        core_gray = gray[y0:y1, x0:x1]
+        core_ink = ink[y0 - ey0:y1 - ey0, x0 - ex0:x1 - ex0]
+
+        ink_pixels = cv2.countNonZero(core_ink)
+        column_ink = cv2.reduce(core_ink, 0, cv2.REDUCE_MAX).ravel() > 0
+
+        heights = []
+        # A letter's top-left corner can lie in a core without ink of its own
+        if ink_pixels or cv2.countNonZero(ink):
+            contours, _ = cv2.findContours(ink, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            for bx, by, _, bh in map(cv2.boundingRect, contours):
+                if bh > 5 and x0 <= ex0 + bx < x1 and y0 <= ey0 + by < y1:
+                    heights.append(bh)
+
+        slant = None
+        if ink_pixels:
+            slant = self._slant_from_gray(core_gray) if self.slant_method in self.SLANT_GRAY_METHODS \
+                else self._slant_from_mask(core_ink)
+
+        stats = {
+            'pixels': core_gray.size,
+            'ink_pixels': ink_pixels,
+            'intensity_sum': int(np.sum(core_gray, dtype=np.uint64)),
+            'column_offset': x0,
+            'column_ink': column_ink,
+            'height_sum': int(sum(heights)),
+            'height_count': len(heights),
+            'slant': slant
+        }
+        if self.autocrop:
+            # Block grids from which page_stats recovers the crop without the whole page
+            stats['block_min'] = self._block_reduce(core_gray, np.minimum)
+            stats['block_sum'] = self._block_reduce(core_gray, np.add, np.uint64)
+        return stats
+
+    def page_stats(self, bands, width, height, tile_size=1024, overlap=128, executor=None, in_flight=1):
+        """Stream a page's row bands through tile_stats and merge the tiles.
+
+        `bands` yields the page's grayscale rows top to bottom (see
+        iter_page_bands). Tiles are full-width bands `tile_size` rows tall:
+        a word is then only ever cut across its height, which the overlap
+        covers, whereas square tiles would cut long words lengthwise. Only
+        the rows of the tiles in flight (up to `in_flight` on `executor`,
+        one at a time without it) and their overlap are kept, so memory is
+        bounded by the tile, not the page, when bands are decoded lazily.
+
+        Returns mergeable page totals (see features_from_stats). Ink sums
+        and intensity sums merge exactly, letter heights exactly for
+        letters up to `overlap` tall, and spacing exactly because tiles OR
+        their column-ink flags into one page-wide row before gaps are
+        measured; slant is the ink-weighted mean of the tile estimates.
+        With auto-crop, the ink box and the cropped pixel and intensity
+        totals come exactly from the tiles' block grids; the ink statistics
+        need no cropping, as there is no ink outside the box.
+        """
+        block = self.AUTOCROP_BLOCK
+        # Block-aligned tiles line their auto-crop grids up with the page's
+        tile_size = -(-tile_size // block) * block
+        bands = iter(bands)
+        window = np.empty((0, width), dtype=np.uint8)
+        window_top = 0
+        pending = deque()
+        tiles = []
+        for y0 in range(0, height, tile_size):
+            y1 = min(height, y0 + tile_size)
+            bottom = min(height, y1 + overlap)
+            while window_top + len(window) < bottom:
+                band = next(bands, None)
+                if band is None:
+                    raise ValueError(f'Page ended at row {window_top + len(window)} of {height}')
+                window = np.vstack([window, band])
+            top = max(0, y0 - overlap)
+            view = window[top - window_top:bottom - window_top]
+            core = (0, y0 - top, width, y1 - top)
+            if executor is None:
+                tiles.append(self.tile_stats(view, core, overlap))
+            else:
+                pending.append(executor.submit(self.tile_stats, view, core, overlap))
+                if len(pending) >= in_flight:
+                    tiles.append(pending.popleft().result())
+            # Drop the rows above the next tile's overlap
+            next_top = max(0, y1 - overlap)
+            window, window_top = window[next_top - window_top:], next_top
+        tiles.extend(future.result() for future in pending)
+
+        pixels = sum(tile['pixels'] for tile in tiles)
+        intensity_sum = sum(tile['intensity_sum'] for tile in tiles)
+        if self.autocrop:
+            bbox = self._bbox_from_cells(np.vstack([tile['block_min'] for tile in tiles]), width, height)
+            if bbox is not None:
+                # The padding is whole blocks, so the box edges fall on block edges
+                x, y, w, h = bbox
+                sums = np.vstack([tile['block_sum'] for tile in tiles])
+                pixels = w * h
+                intensity_sum = int(sums[y // block:-(-(y + h) // block), x // block:-(-(x + w) // block)].sum())
+
+        column_ink = np.zeros(width, dtype=bool)
+        for tile in tiles:
+            offset = tile['column_offset']
+            column_ink[offset:offset + len(tile['column_ink'])] |= tile['column_ink']
+        gaps = np.diff(np.flatnonzero(column_ink)).astype(np.int64)
+
+        slanted = [tile for tile in tiles if tile['slant'] is not None]
+        return {
+            'width': width,
+            'height': height,
+            'tiles': len(tiles),
+            'pixels': pixels,
+            'ink_pixels': sum(tile['ink_pixels'] for tile in tiles),
+            'intensity_sum': intensity_sum,
+            'height_sum': sum(tile['height_sum'] for tile in tiles),
+            'height_count': sum(tile['height_count'] for tile in tiles),
+            'slant_sum': sum(tile['slant'] * tile['ink_pixels'] for tile in slanted),
+            'slant_weight': sum(tile['ink_pixels'] for tile in slanted),
+            'gap_count': len(gaps),
+            'gap_sum': int(gaps.sum()),
+            'gap_sum_squares': int(np.dot(gaps, gaps))
+        }
+
+    def features_from_stats(self, stats):
+        """Features from page totals, or from totals summed over several pages"""
+        pixels = stats['pixels']
+        n = stats['gap_count']
+        # Population std of the pooled gaps, from exact integer sums
+        spacing = float(np.sqrt(max(0, n * stats['gap_sum_squares'] - stats['gap_sum'] ** 2)) / n) if n > 1 else 0
+        return {
+            'slant_angle': float(stats['slant_sum'] / stats['slant_weight']) if stats['slant_weight'] else 0,
+            'letter_size': stats['height_sum'] / stats['height_count'] if stats['height_count'] else 0,
+            'stroke_width': float(stats['ink_pixels'] / pixels * 100) if pixels else 0,
+            'pressure': float(stats['intensity_sum'] / (255 * pixels) * 100) if pixels else 0,
+            'spacing': spacing
+        }
+
+    def _block_reduce(self, gray, ufunc, dtype=None):
+        """Reduce `gray` over AUTOCROP_BLOCK-pixel blocks; edge blocks may be partial"""
+        block = self.AUTOCROP_BLOCK
+        h, w = gray.shape
+        hb, wb = h // block, w // block
+        # Row blocks first: a contiguous reduction that leaves a 1/block-height image
+        rows = ufunc.reduce(gray[:hb * block].reshape(hb, block, w), axis=1, dtype=dtype)
+        if h % block:
+            rows = np.vstack([rows, ufunc.reduce(gray[hb * block:], axis=0, dtype=dtype)])
+        cells = ufunc.reduce(rows[:, :wb * block].reshape(len(rows), wb, block), axis=2, dtype=dtype)
+        if w % block:
+            cells = np.hstack([cells, ufunc.reduce(rows[:, wb * block:], axis=1, dtype=dtype, keepdims=True)])
+        return cells
+
+    def _bbox_from_cells(self, cells, w, h):
+        """Padded ink box of a page from its grid of darkest-pixel cells, or None if blank"""
+        block = self.AUTOCROP_BLOCK
+        # THRESH_BINARY_INV marks pixels <= threshold as ink
+        points = cv2.findNonZero((cells <= self.threshold).view(np.uint8))
+        if points is None:
+            return None
+        bx, by, bw, bh = cv2.boundingRect(points)
+        pad = self.autocrop_padding
+        x0, y0 = max(0, bx * block - pad), max(0, by * block - pad)
+        x1, y1 = min(w, (bx + bw) * block + pad), min(h, (by + bh) * block + pad)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def ink_bbox(self, gray):
+        """(x, y, w, h) of the ink plus padding, or None for a blank page.
+
+        Works on a 1/AUTOCROP_BLOCK grid where each cell holds the darkest
+        pixel of its block, so a cell is ink exactly when its block has a
+        pixel the binarization threshold would call ink. The box is
+        therefore never tighter than the ink, at block granularity.
+        """
+        h, w = gray.shape
+        return self._bbox_from_cells(self._block_reduce(gray, np.minimum), w, h)
+
+    def crop_to_ink(self, gray):
+        """Zero-copy view of `gray` cropped to the padded ink bounding box"""
+        bbox = self.ink_bbox(gray)
+        if bbox is None:
+            return gray
+        x, y, w, h = bbox
+        return gray[y:y + h, x:x + w]
+
+    def _to_gray(self, image_array):
+        """Convert an RGB(A) or grayscale array to a single channel"""
+        return cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY) if len(image_array.shape) == 3 else image_array
+
+    def _letter_size_from_mask(self, ink, min_height=5):
+        """Average letter height from a binarized ink mask"""
+        contours, _ = cv2.findContours(ink, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # Filter out noise
+        heights = [h for _, _, _, h in map(cv2.boundingRect, contours) if h > min_height]
+        return float(np.mean(heights)) if heights else 0
+
+    def _spacing_from_mask(self, ink, scale=1.0):
+        """Spacing consistency from the columns of a binarized ink mask.
+
+        The std of the distances between consecutive ink columns, as it
+        would be measured at the original resolution: on a mask downscaled
+        by `scale`, each step between adjacent ink columns stands for
+        `scale` of them and each blank run for one `scale` times wider.
+        """
+        # A column has ink iff its maximum is non-zero; avoids a wide sum
+        column_max = cv2.reduce(ink, 0, cv2.REDUCE_MAX)
+        white_runs = np.flatnonzero(column_max)
+
+        if len(white_runs) == 0:
+            return 0
+
+        gaps = np.diff(white_runs)
+        if len(gaps) <= 1:
+            return 0
+        if scale == 1:
+            return float(np.std(gaps))
+        adjacent = gaps == 1
+        weights = np.where(adjacent, scale, 1.0)
+        distances = np.where(adjacent, 1.0, (gaps - 1) * scale + 1)
+        mean = np.average(distances, weights=weights)
+        return float(np.sqrt(np.average((distances - mean) ** 2, weights=weights)))
+
+    def _slant_from_mask(self, ink):
+        """Slant in degrees from vertical (positive leans right), or 0 when the ink does not decide it"""
+        small = self._slant_roi(ink)
+        if small is None:
+            return 0
+        slant = self._slant_projection(small)
+        return slant if slant is not None else 0
+
+    def _slant_from_gray(self, image):
+        """Slant with the configured grayscale-edge estimator"""
+        return self._slant_hough(image) if self.slant_method == 'hough' else self._slant_hough_vertical(image)
+
+    def _slant_roi(self, ink):
+        """Mask downscaled so its longer side is at most SLANT_MAX_SIDE, cropped to the ink"""
+        h, w = ink.shape[:2]
+        ratio = self.SLANT_MAX_SIDE / max(h, w, 1)
+        if ratio < 1:
+            size = (max(1, int(w * ratio)), max(1, int(h * ratio)))
+            # Area averaging keeps thin strokes as partial coverage. A quarter coverage
+            # counts as ink: any coverage would blur strokes into blobs that grow with
+            # the downscale factor, so the estimate would depend on the working resolution
+            ink = cv2.resize(ink, size, interpolation=cv2.INTER_AREA)
+        mask = (ink >= self.SLANT_MIN_COVERAGE).view(np.uint8)
+        points = cv2.findNonZero(mask)
+        if points is None:
+            return None
+        x, y, w, h = cv2.boundingRect(points)
+        return mask[y:y + h, x:x + w]
+
+    def _slant_projection(self, mask):
+        """Sheared projection profiles: the shear that makes column histograms sharpest.
+
+        Shearing ink pixels by x' = x + y*tan(a) stands strokes leaning by
+        `a` upright, which concentrates them into few columns. Profiles are
+        taken per horizontal band, because shearing a whole page also
+        widens it, which flattens a single page-wide profile whatever the
+        strokes do. All candidate angles are evaluated at once: one
+        (angles x points) array of sheared coordinates and a single
+        bincount. A coarse pass over the whole range is refined around its
+        best angle. Returns None when the profile is too flat, peaks at the
+        edge of the range or there is too little ink to decide.
+        """
+        ys, xs = np.nonzero(mask)
+        if len(xs) < self.SLANT_MIN_POINTS:
+            return None
+        if len(xs) > self.SLANT_MAX_POINTS:
+            # Seeded random subsample bounds the per-angle cost; taking every n-th
+            # point in raster order would alias with the stroke pattern
+            keep = np.random.default_rng(0).choice(len(xs), self.SLANT_MAX_POINTS, replace=False)
+            ys, xs = ys[keep], xs[keep]
+        bands = (ys // self.SLANT_BAND_HEIGHT).astype(np.int32)
+        band_count = int(bands.max()) + 1
+        ys = ys.astype(np.float32)
+        xs = xs.astype(np.float32)
+
+        def sharpest(angles):
+            tans = np.tan(np.radians(angles)).astype(np.float32)
+            sheared = np.rint(xs[None, :] + tans[:, None] * ys[None, :]).astype(np.int32)
+            sheared -= sheared.min()
+            width = int(sheared.max()) + 1
+            # One histogram bin per (angle, band, column)
+            sheared += (np.arange(len(angles), dtype=np.int32)[:, None] * band_count + bands[None, :]) * width
+            profiles = np.bincount(sheared.ravel(), minlength=len(angles) * band_count * width)
+            profiles = profiles.reshape(len(angles), band_count * width)
+            return np.einsum('ij,ij->i', profiles, profiles, dtype=np.float64)
+
+        coarse = np.arange(-self.SLANT_RANGE, self.SLANT_RANGE + self.SLANT_COARSE_STEP / 2, self.SLANT_COARSE_STEP)
+        energy = sharpest(coarse)
+        peak = int(np.argmax(energy))
+        # A maximum at the edge of the search range is not a peak
+        if energy.max() <= energy.min() * 1.01 or peak in (0, len(coarse) - 1):
+            return None
+        best = coarse[peak]
+
+        fine = np.arange(best - self.SLANT_COARSE_STEP, best + self.SLANT_COARSE_STEP + self.SLANT_FINE_STEP / 2,
+                         self.SLANT_FINE_STEP)
+        best = fine[int(np.argmax(sharpest(fine)))]
+        return float(np.clip(best, -self.SLANT_RANGE, self.SLANT_RANGE))
+
     def _calculate_slant_angle(self, image):
-        """Calculate handwriting slant angle"""
+        """Calculate handwriting slant angle with the configured estimator"""
+        if self.slant_method in self.SLANT_GRAY_METHODS:
+            return self._slant_from_gray(image)
+        _, thresh = cv2.threshold(image, self.threshold, 255, cv2.THRESH_BINARY_INV)
+        return self._slant_from_mask(thresh)
+
+    def _slant_hough(self, image):
+        """Original estimator, kept unchanged: mean of theta - 90 over the 10 strongest Hough lines"""
         edges = cv2.Canny(image, 50, 150)
         lines = cv2.HoughLines(edges, 1, np.pi / 180, 100)
         
@@ -75,9 +451,24 @@ class HandwritingFeatureExtractor:
         angles = [(theta * 180 / np.pi) - 90 for rho, theta in [line[0] for line in lines[:10]]]
         return float(np.mean(angles)) if angles else 0
 
+    def _slant_hough_vertical(self, image):
+        """Mean lean of the 10 strongest near-vertical full-image Hough lines"""
+        edges = cv2.Canny(image, 50, 150)
+        lines = cv2.HoughLines(edges, 1, np.pi / 180, 100)
+        
+        if lines is None or len(lines) == 0:
+            return 0
+        
+        # theta is the angle of the line's normal; as a lean from vertical
+        # (rightward positive, like the other estimators) it is theta or theta - 180
+        thetas = np.degrees(lines.reshape(-1, 2)[:, 1])
+        leans = np.where(thetas > 90, thetas - 180, thetas)
+        leans = leans[np.abs(leans) <= self.SLANT_RANGE][:10]
+        return float(np.mean(leans)) if len(leans) else 0
+
     def _calculate_letter_size(self, image):
         """Calculate average letter height"""
-        _, thresh = cv2.threshold(image, 128, 255, cv2.THRESH_BINARY_INV)
+        _, thresh = cv2.threshold(image, self.threshold, 255, cv2.THRESH_BINARY_INV)
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         if not contours:
@@ -93,7 +484,7 @@ class HandwritingFeatureExtractor:
 
     def _calculate_stroke_width(self, image):
         """Calculate stroke thickness"""
-        _, thresh = cv2.threshold(image, 128, 255, cv2.THRESH_BINARY_INV)
+        _, thresh = cv2.threshold(image, self.threshold, 255, cv2.THRESH_BINARY_INV)
         return float(np.sum(thresh) / (255 * image.size) * 100) if image.size > 0 else 0
 
     def _calculate_pressure(self, image):
@@ -103,7 +494,7 @@ class HandwritingFeatureExtractor:
 
     def _calculate_spacing(self, image):
         """Calculate consistency of letter spacing"""
-        _, thresh = cv2.threshold(image, 128, 255, cv2.THRESH_BINARY_INV)
+        _, thresh = cv2.threshold(image, self.threshold, 255, cv2.THRESH_BINARY_INV)
         
         # Find horizontal projections
         horizontal_projection = np.sum(thresh, axis=0)
@@ -175,63 +566,688 @@ class HandwritingFeatureExtractor:
         }
         return analyses.get(behavior, "Analysis unavailable")
 
+# Batch workers
+_worker_extractor = None
+_worker_max_side = None
+
+def _init_batch_worker(extractor, max_side=None):
+    """Process-pool initializer: reuse one extractor per worker"""
+    global _worker_extractor, _worker_max_side
+    _worker_extractor = extractor
+    _worker_max_side = max_side
+
+class _BufferReader(io.RawIOBase):
+    """Seekable file over a bytes-like object that reads from it without copying it whole"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self._view) - self._position))
+        b[:n] = self._view[self._position:self._position + n]
+        self._position += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+# cv2 decodes JPEGs directly at 1/2, 1/4 or 1/8 size with these flags
+_REDUCED_GRAYSCALE = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                      (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+
+def decode_image(image_bytes, max_side=None):
+    """Decode image bytes to a grayscale array capped at `max_side` pixels.
+
+    Accepts any bytes-like object (bytes, bytearray, memoryview) and hands
+    it to cv2.imdecode through a zero-copy numpy view. Only the header is
+    parsed up front to pick a reduced decode: JPEGs come out of libjpeg
+    already scaled by 1/2, 1/4 or 1/8, so a full-size buffer never exists;
+    other formats are reduced after decoding. Returns the array and the
+    original-to-working scale factor.
+    """
+    with Image.open(_BufferReader(image_bytes)) as header:
+        original_side = max(header.size)
+
+    flags = cv2.IMREAD_GRAYSCALE
+    if max_side and original_side > max_side:
+        for factor, reduced in _REDUCED_GRAYSCALE:
+            if original_side // factor >= max_side:
+                flags = reduced
+                break
+    # Match PIL, which never applied EXIF rotation
+    gray = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    if gray is None:
+        return _decode_with_pil(image_bytes, max_side)
+
+    if max_side and max(gray.shape) > max_side:
+        ratio = max_side / max(gray.shape)
+        size = (max(1, int(gray.shape[1] * ratio)), max(1, int(gray.shape[0] * ratio)))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    return gray, original_side / max(gray.shape)
+
+def _decode_with_pil(image_bytes, max_side=None):
+    """Fallback for formats the cv2 build cannot decode"""
+    image = Image.open(_BufferReader(image_bytes))
+    original_side = max(image.size)
+    image = image.convert('L')
+    if max_side and original_side > max_side:
+        image.thumbnail((max_side, max_side), Image.BILINEAR)
+    return np.asarray(image), original_side / max(image.size)
+
+def iter_pages(image_bytes):
+    """(index, grayscale array) for each frame of a possibly multi-page image.
+
+    Frames are decoded one at a time, so only the current page is held in
+    memory; see iter_page_bands to decode a page in parts.
+    """
+    with Image.open(_BufferReader(image_bytes)) as image:
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            yield index, np.asarray(frame.convert('L'))
+
+# TIFF tags a run of strips or tiles needs to decode on its own (292/293: CCITT T4/T6 options)
+_TIFF_DECODE_TAGS = (
+    TiffImagePlugin.IMAGEWIDTH, TiffImagePlugin.BITSPERSAMPLE, TiffImagePlugin.COMPRESSION,
+    TiffImagePlugin.PHOTOMETRIC_INTERPRETATION, TiffImagePlugin.FILLORDER, TiffImagePlugin.SAMPLESPERPIXEL,
+    TiffImagePlugin.ROWSPERSTRIP, TiffImagePlugin.PLANAR_CONFIGURATION, 292, 293, TiffImagePlugin.PREDICTOR,
+    TiffImagePlugin.COLORMAP, TiffImagePlugin.TILEWIDTH, TiffImagePlugin.TILELENGTH, TiffImagePlugin.EXTRASAMPLES,
+    TiffImagePlugin.SAMPLEFORMAT, TiffImagePlugin.JPEGTABLES, TiffImagePlugin.YCBCRSUBSAMPLING,
+    TiffImagePlugin.REFERENCEBLACKWHITE,
+)
+
+def _tiff_bands(frame, image_bytes, band_rows):
+    """Row bands of a strip- or tile-organised TIFF page, decoded one at a time.
+
+    Each band is rewrapped as a small TIFF holding only the strips (or rows
+    of tiles) that cover it, so the rest of the page is never decoded.
+    Returns None for pages that cannot be split: a single strip, separate
+    colour planes, old-style JPEG or BigTIFF.
+    """
+    tags = frame.tag_v2
+    header = bytes(image_bytes[:4])
+    if header[2:4] not in (b'*\x00', b'\x00*') or tags.get(TiffImagePlugin.PLANAR_CONFIGURATION, 1) != 1 \
+            or tags.get(TiffImagePlugin.COMPRESSION) == 6:
+        return None
+    width, height = frame.size
+    if TiffImagePlugin.TILEOFFSETS in tags:
+        offsets_tag, counts_tag = TiffImagePlugin.TILEOFFSETS, TiffImagePlugin.TILEBYTECOUNTS
+        unit_rows = tags[TiffImagePlugin.TILELENGTH]
+        per_row = -(-width // tags[TiffImagePlugin.TILEWIDTH])
+    else:
+        offsets_tag, counts_tag = TiffImagePlugin.STRIPOFFSETS, TiffImagePlugin.STRIPBYTECOUNTS
+        unit_rows = min(height, tags.get(TiffImagePlugin.ROWSPERSTRIP, height))
+        per_row = 1
+    offsets, counts = tags.get(offsets_tag), tags.get(counts_tag)
+    if not offsets or not counts or unit_rows >= height:
+        return None
+    offsets = offsets if isinstance(offsets, tuple) else (offsets,)
+    counts = counts if isinstance(counts, tuple) else (counts,)
+    layout = [(tag, tags[tag], tags.tagtype[tag]) for tag in _TIFF_DECODE_TAGS if tag in tags]
+    step = max(1, band_rows // unit_rows) * unit_rows
+
+    def bands():
+        for y0 in range(0, height, step):
+            first, last = y0 // unit_rows * per_row, -(-min(height, y0 + step) // unit_rows) * per_row
+            ifd = TiffImagePlugin.ImageFileDirectory_v2(header + b'\x00' * 4)
+            for tag, value, tagtype in layout:
+                ifd[tag] = value
+                ifd.tagtype[tag] = tagtype
+            ifd[TiffImagePlugin.IMAGELENGTH] = min(height, y0 + step) - y0
+            ifd.tagtype[TiffImagePlugin.IMAGELENGTH] = TiffTags.LONG
+            # Strip data follows the IFD; positions are relative to its end until placed
+            positions = tuple(int(p) for p in np.cumsum((0,) + counts[first:last - 1]))
+            ifd[counts_tag] = counts[first:last]
+            ifd[offsets_tag] = positions
+            ifd.tagtype[counts_tag] = ifd.tagtype[offsets_tag] = TiffTags.LONG
+            directory = ifd.tobytes(8)
+            if offsets_tag == TiffImagePlugin.TILEOFFSETS:
+                # Only strip offsets are placed by tobytes; same length once rewritten
+                ifd[offsets_tag] = tuple(8 + len(directory) + p for p in positions)
+                directory = ifd.tobytes(8)
+            data = b''.join(image_bytes[o:o + c] for o, c in zip(offsets[first:last], counts[first:last]))
+            with Image.open(io.BytesIO(header + (8).to_bytes(4, 'little' if header[:2] == b'II' else 'big')
+                                       + directory + data)) as band:
+                yield np.asarray(band.convert('L'))
+
+    return bands()
+
+def iter_page_bands(image_bytes, band_rows=1024):
+    """(index, width, height, bands) for each page of a possibly multi-page image.
+
+    `bands` yields the page's grayscale rows top to bottom and must be
+    consumed before the next page. Strip- and tile-organised TIFF pages
+    are decoded about `band_rows` rows at a time; other pages (PNG, JPEG,
+    single-strip TIFF) can only be decoded whole and come as one band.
+    """
+    with Image.open(_BufferReader(image_bytes)) as image:
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            width, height = frame.size
+            bands = _tiff_bands(frame, image_bytes, band_rows) if image.format == 'TIFF' else None
+            if bands is None:
+                bands = iter([np.asarray(frame.convert('L'))])
+            yield index, width, height, bands
+
+def _extract_with(extractor, image_bytes, max_side=None, cnn_input_size=None):
+    """Decode one image and extract its features, returning (features, cnn_image, error).
+
+    With `cnn_input_size`, a small uint8 copy resized for the CNN is
+    returned as well, so the full working image never leaves the worker.
+    """
+    try:
+        gray, scale = decode_image(image_bytes, max_side)
+        cnn_image = None
+        if cnn_input_size:
+            cnn_image = np.asarray(Image.fromarray(gray).resize((cnn_input_size, cnn_input_size), Image.BILINEAR))
+        return extractor.extract_features(gray, scale), cnn_image, None
+    except Exception as e:
+        return None, None, str(e)
+
+def _extract_from_bytes(image_bytes, cnn_input_size=None):
+    """Process-pool worker entry point"""
+    return _extract_with(_worker_extractor, image_bytes, _worker_max_side, cnn_input_size)
+
 # Model Manager
 class BehaviorDetectionModel:
-    def __init__(self, model_path=None):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = HandwritingBehaviorCNN().to(self.device)
+    PREDICTION_MODES = ('rules', 'cnn')
+
+    def __init__(self, model_path=None, batch_workers=None, cache=None, max_side=None, require_cnn=None,
+                 prediction_mode=None):
         self.feature_extractor = HandwritingFeatureExtractor()
-        self.transform = transforms.Compose([
-            transforms.Grayscale(num_output_channels=1),
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.5], std=[0.5])
-        ])
+        # Default scoring mode; 'cnn' returns CNN scores alongside the rule-based ones
+        self.prediction_mode = prediction_mode or os.environ.get('PREDICTION_MODE', 'rules')
+        if self.prediction_mode not in self.PREDICTION_MODES:
+            raise ValueError(f"Unknown prediction mode: {self.prediction_mode}")
+        self.batch_workers = batch_workers or int(os.environ.get('BATCH_WORKERS', 0)) or os.cpu_count() or 1
+        # Working resolution cap for decoded uploads (0 disables the cap)
+        self.max_side = max_side if max_side is not None else int(os.environ.get('MAX_IMAGE_SIDE', 2048))
+        # Readiness waits for the CNN only when a CNN-backed mode needs it
+        if require_cnn is None:
+            require_cnn = self.prediction_mode == 'cnn' or os.environ.get('REQUIRE_CNN', '0') == '1'
+        self.require_cnn = require_cnn
+        # Dynamic batching of concurrent CNN requests
+        self.cnn_max_batch = int(os.environ.get('CNN_MAX_BATCH', 16))
+        self.cnn_max_wait_ms = float(os.environ.get('CNN_MAX_WAIT_MS', 5))
+        self.cnn_threads = int(os.environ.get('CNN_THREADS', 0)) or os.cpu_count() or 1
+        # Architecture for untrained networks; checkpoints record their own
+        self.arch = os.environ.get('CNN_ARCH', 'baseline')
+        self._input_size = int(os.environ.get('CNN_INPUT_SIZE', 0)) or None
+        # Exported artifact to prefer next to the checkpoint: auto, int8, torchscript or eager
+        self.cnn_artifact = os.environ.get('CNN_ARTIFACT', 'auto')
+        self.loaded_artifact = None
+        self._batcher = None
+        self.model_path = None
+        self._network = None
+        self._device = None
+        self._transform = None
+        self._network_lock = threading.Lock()
+        self._pool = None
+        self._tile_pool = None
+        # Tiled document processing (predict_document)
+        self.tile_size = int(os.environ.get('TILE_SIZE', 1024))
+        self.tile_overlap = int(os.environ.get('TILE_OVERLAP', 128))
+        self.tile_workers = int(os.environ.get('TILE_WORKERS', 0)) or os.cpu_count() or 1
+        self._weights_id = None
+        self.cache = cache if cache is not None else PredictionCache(
+            max_size=int(os.environ.get('PREDICTION_CACHE_SIZE', 1024)),
+            ttl=float(os.environ.get('PREDICTION_CACHE_TTL', 3600)),
+            cache_dir=os.environ.get('PREDICTION_CACHE_DIR') or None
+        )
         
         if model_path:
             self.load_model(model_path)
-        else:
-            self.model.eval()
+
+    @property
+    def device(self):
+        """Torch device, resolved on first use"""
+        if self._device is None:
+            import torch
+            self._device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        return self._device
+
+    @property
+    def model(self):
+        """The CNN, built (and its weights loaded) on first access"""
+        if self._network is None:
+            with self._network_lock:
+                if self._network is None:
+                    self._network = self._build_network()
+        return self._network
+
+    @property
+    def transform(self):
+        """CNN input preprocessing pipeline"""
+        if self._transform is None:
+            from torchvision import transforms
+            self._transform = transforms.Compose([
+                transforms.Grayscale(num_output_channels=1),
+                transforms.Resize((self.cnn_input_size, self.cnn_input_size)),
+                transforms.ToTensor(),
+                transforms.Normalize(mean=[0.5], std=[0.5])
+            ])
+        return self._transform
+
+    @property
+    def cnn_input_size(self):
+        """Square input size of the loaded architecture"""
+        self.model
+        return self._input_size
+
+    @property
+    def cnn_loaded(self):
+        return self._network is not None
+
+    @property
+    def cnn_trained(self):
+        """Whether trained weights (a checkpoint or its exported artifact) back the CNN"""
+        return self._weights_id is not None
+
+    def is_ready(self):
+        """Readiness: rule-based scoring is always ready; CNN modes wait for trained weights to load"""
+        return not self.require_cnn or (self.cnn_loaded and self.cnn_trained)
 
     def load_model(self, path):
-        """Load pre-trained model weights"""
+        """Load pre-trained model weights (deferred until the CNN is first used)"""
+        self.model_path = path
         try:
-            self.model.load_state_dict(torch.load(path, map_location=self.device))
-            self.model.eval()
-        except Exception as e:
+            stat = os.stat(path)
+            self._weights_id = f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+        except OSError as e:
             print(f"Could not load model: {e}. Using untrained model.")
+            return
+        # Exported artifacts next to the checkpoint (cnn.artifact_paths) are chosen
+        # when the CNN loads; a re-export must invalidate cached CNN scores too
+        stem = os.path.splitext(path)[0]
+        for suffix in ('.int8.pt', '.ts.pt'):
+            try:
+                stat = os.stat(stem + suffix)
+                self._weights_id += f'|{suffix}:{stat.st_size}:{stat.st_mtime_ns}'
+            except OSError:
+                pass
+        if self._network is not None:
+            # Rebuild so the checkpoint's architecture is honoured
+            with self._network_lock:
+                self._transform = None
+                self._network = self._build_network()
+
+    def _build_network(self):
+        """Construct the CNN on the device and load any pending weights"""
+        import torch
+        from cnn import build_model, default_input_size, load_artifact, load_checkpoint
+        torch.set_num_threads(self.cnn_threads)
+
+        if self.model_path:
+            try:
+                artifact = load_artifact(self.model_path, self.cnn_artifact)
+            except Exception as e:
+                print(f"Could not load exported model: {e}. Falling back to checkpoint.")
+                artifact = None
+            if artifact is not None:
+                # Exported artifacts are CPU-only
+                network, self.arch, self._input_size, self.loaded_artifact = artifact
+                self._device = torch.device('cpu')
+                print(f"Loaded {self.loaded_artifact} CNN artifact for {self.model_path}")
+                return network
+
+        self.loaded_artifact = 'eager'
+        arch, input_size, state_dict = self.arch, None, None
+        if self.model_path:
+            try:
+                arch, input_size, state_dict = load_checkpoint(self.model_path, map_location=self.device)
+            except Exception as e:
+                print(f"Could not load model: {e}. Using untrained model.")
 
-    def predict(self, image_bytes):
+        network = build_model(arch).to(self.device)
+        if state_dict is not None:
+            try:
+                network.load_state_dict(state_dict)
+            except Exception as e:
+                print(f"Could not load model: {e}. Using untrained model.")
+                state_dict = None
+        if state_dict is None:
+            # Random weights: CNN mode falls back to rules (see _cnn_mode)
+            self._weights_id = None
+        network.eval()
+
+        self.arch = arch
+        # The baseline's flatten layer only accepts its native size
+        if arch == 'baseline' or not self._input_size:
+            self._input_size = input_size or default_input_size(arch)
+        return network
+
+    def predict(self, image_bytes, mode=None):
         """Predict behavior from image bytes"""
+        mode, unavailable = self._cnn_mode(self._resolve_mode(mode))
+        with metrics.stage('cache_lookup'):
+            image_hash = content_hash(image_bytes)
+            cached = self.cache_lookup(image_hash, mode)
+        if cached is not None:
+            return self._flag_unavailable(cached, unavailable)
+
         try:
-            # Load image from bytes
-            image = Image.open(io.BytesIO(image_bytes))
-            image_array = np.array(image)
+            # Load image from bytes at the capped working resolution
+            with metrics.stage('decode'):
+                gray, scale = decode_image(image_bytes, self.max_side)
             
             # Extract features
-            features = self.feature_extractor.extract_features(image_array)
-            
-            # Get rule-based prediction
-            prediction = self.feature_extractor.predict_behavior_from_features(features)
-            
-            # Add feature details
-            prediction.update({
-                'slant_angle': features['slant_angle'],
-                'avg_size': features['letter_size'],
-                'stroke': features['stroke_width'],
-                'pressure': features['pressure'],
-                'spacing': features['spacing']
-            })
+            with metrics.stage('features'):
+                features = self.feature_extractor.extract_features(gray, scale)
             
+            if mode == 'cnn':
+                # Concurrent requests are grouped into one forward pass
+                with metrics.stage('cnn'):
+                    probabilities = self._get_batcher()(self._cnn_tensor(gray))
+                with metrics.stage('scoring'):
+                    prediction = self._build_cnn_prediction(features, probabilities, image_hash)
+            else:
+                with metrics.stage('scoring'):
+                    prediction = self._build_prediction(features, image_hash)
+            with metrics.stage('cache_store'):
+                self.cache_store(image_hash, mode, prediction)
+            return self._flag_unavailable(prediction, unavailable)
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            return self.error_prediction(e, image_hash)
+
+    def predict_document(self, image_bytes):
+        """Rule-based prediction for a large or multi-page scan, processed page by page in tiles.
+
+        Pages are read at full resolution (no MAX_IMAGE_SIDE cap) one at a
+        time and streamed through TILE_SIZE tiles processed in parallel.
+        Strip- and tile-organised TIFF pages are decoded band by band, so
+        peak memory is the tiles in flight; other formats are decoded a
+        whole page at a time. Per-page results are returned under 'pages';
+        the top-level result merges the statistics of every page.
+        """
+        image_hash = content_hash(image_bytes)
+        cached = self.cache_lookup(image_hash, 'tiled')
+        if cached is not None:
+            return cached
+
+        try:
+            extractor = self.feature_extractor
+            executor = self._get_tile_pool()
+            pages = []
+            totals = None
+            for index, width, height, bands in iter_page_bands(image_bytes, self.tile_size):
+                with metrics.stage('page'):
+                    stats = extractor.page_stats(bands, width, height, self.tile_size, self.tile_overlap,
+                                                 executor, self.tile_workers)
+                features = extractor.features_from_stats(stats)
+                page = extractor.predict_behavior_from_features(features)
+                pages.append({
+                    'page': index + 1,
+                    'width': stats['width'],
+                    'height': stats['height'],
+                    'tiles': stats['tiles'],
+                    'behavior': page['behavior'],
+                    'confidence': page['confidence'],
+                    'scores': page['scores'],
+                    'slant_angle': features['slant_angle'],
+                    'avg_size': features['letter_size'],
+                    'stroke': features['stroke_width'],
+                    'pressure': features['pressure'],
+                    'spacing': features['spacing']
+                })
+                if totals is None:
+                    totals = {key: value for key, value in stats.items() if key not in ('width', 'height')}
+                else:
+                    for key in totals:
+                        totals[key] += stats[key]
+
+            if totals is None:
+                raise ValueError('Document has no pages')
+            prediction = self._build_prediction(extractor.features_from_stats(totals), image_hash)
+            prediction['mode'] = 'tiled'
+            prediction['page_count'] = len(pages)
+            prediction['pages'] = pages
+            self.cache_store(image_hash, 'tiled', prediction)
             return prediction
         except Exception as e:
             print(f"Prediction error: {e}")
-            return {
-                'behavior': 'Unknown',
-                'confidence': 0.0,
-                'scores': {},
-                'error': str(e)
-            }
+            return self.error_prediction(e, image_hash)
+
+    def predict_batch(self, images, mode=None):
+        """Predict behavior for a list of image bytes, preserving input order.
+
+        Cached and duplicate images are resolved up front; decoding and
+        feature extraction for the rest are spread across a process pool.
+        An image that fails yields an error entry instead of failing the batch.
+        """
+        mode, unavailable = self._cnn_mode(self._resolve_mode(mode))
+        hashes = [content_hash(image_bytes) for image_bytes in images]
+        resolved = {}
+        pending = {}
+        for image_hash, image_bytes in zip(hashes, images):
+            if image_hash in resolved or image_hash in pending:
+                continue
+            cached = self.cache_lookup(image_hash, mode)
+            if cached is not None:
+                resolved[image_hash] = cached
+            else:
+                pending[image_hash] = image_bytes
+
+        cnn_input_size = self.cnn_input_size if mode == 'cnn' else None
+        with metrics.stage('batch_extract'):
+            if len(pending) <= 1 or self.batch_workers <= 1:
+                extracted = [_extract_with(self.feature_extractor, image_bytes, self.max_side, cnn_input_size)
+                             for image_bytes in pending.values()]
+            else:
+                chunksize = max(1, len(pending) // (self.batch_workers * 4))
+                worker = partial(_extract_from_bytes, cnn_input_size=cnn_input_size)
+                pool = self._get_pool()
+                try:
+                    extracted = list(pool.map(worker, pending.values(), chunksize=chunksize))
+                except BrokenProcessPool as e:
+                    # A worker died (decoder crash, OOM); fail this batch and start a fresh pool next time
+                    self._discard_pool(pool)
+                    error = f'Batch worker process died: {e}'
+                    extracted = [(None, None, error)] * len(pending)
+
+        succeeded = [(image_hash, features, cnn_image)
+                     for image_hash, (features, cnn_image, error) in zip(pending, extracted) if error is None]
+        for image_hash, (_, _, error) in zip(pending, extracted):
+            if error is not None:
+                print(f"Prediction error: {error}")
+                resolved[image_hash] = self.error_prediction(error, image_hash)
+
+        if mode == 'cnn':
+            with metrics.stage('batch_cnn'):
+                tensors = [self._cnn_tensor(cnn_image) for _, _, cnn_image in succeeded]
+                probabilities = []
+                for start in range(0, len(tensors), self.cnn_max_batch):
+                    probabilities.extend(self._forward_batch(tensors[start:start + self.cnn_max_batch]))
+            for (image_hash, features, _), probs in zip(succeeded, probabilities):
+                resolved[image_hash] = self._build_cnn_prediction(features, probs, image_hash)
+        else:
+            for image_hash, features, _ in succeeded:
+                resolved[image_hash] = self._build_prediction(features, image_hash)
+
+        for image_hash, _, _ in succeeded:
+            self.cache_store(image_hash, mode, resolved[image_hash])
+
+        # Duplicates in one batch get independent copies of the same result
+        results = []
+        seen = set()
+        for image_hash in hashes:
+            prediction = resolved[image_hash]
+            prediction = json.loads(json.dumps(prediction)) if image_hash in seen else prediction
+            results.append(self._flag_unavailable(prediction, unavailable))
+            seen.add(image_hash)
+        return results
+
+    def batcher_stats(self):
+        """Micro-batching counters, empty until CNN mode is first used"""
+        return self._batcher.stats() if self._batcher is not None else {}
+
+    def _resolve_mode(self, mode):
+        mode = mode or self.prediction_mode
+        if mode not in self.PREDICTION_MODES:
+            raise ValueError(f"Unknown prediction mode: {mode}")
+        return mode
+
+    def _cnn_mode(self, mode):
+        """Rules instead of an untrained CNN: (mode to run, reason CNN was unavailable or None)"""
+        if mode == 'cnn' and self.cnn_trained:
+            # Building the network first catches a checkpoint that fails to load
+            self.model
+        if mode == 'cnn' and not self.cnn_trained:
+            return 'rules', 'No trained CNN weights loaded (set MODEL_PATH); rule-based result returned'
+        return mode, None
+
+    def _flag_unavailable(self, prediction, unavailable):
+        # A copy, so the cached rule-based prediction is not modified
+        return dict(prediction, cnn_unavailable=unavailable) if unavailable else prediction
+
+    def _get_batcher(self):
+        """Start the CNN micro-batching scheduler on first use"""
+        if self._batcher is None:
+            with self._network_lock:
+                if self._batcher is None:
+                    self._batcher = MicroBatcher(self._forward_batch, self.cnn_max_batch, self.cnn_max_wait_ms)
+        return self._batcher
+
+    def _cnn_tensor(self, gray):
+        """Preprocess a grayscale array into a CNN input tensor"""
+        return self.transform(Image.fromarray(gray))
+
+    def _forward_batch(self, tensors):
+        """Run one batched forward pass, returning class probabilities per item"""
+        import torch
+        network = self.model
+        with torch.inference_mode():
+            logits = network(torch.stack(tensors).to(self.device))
+            return torch.softmax(logits, dim=1).cpu().tolist()
+
+    def _build_cnn_prediction(self, features, probabilities, image_hash=None):
+        """CNN prediction payload, keeping the rule-based result for comparison"""
+        prediction = self._build_prediction(features, image_hash)
+        classes = self.feature_extractor.behavior_classes
+        cnn_scores = {behavior: float(p) for behavior, p in zip(classes, probabilities)}
+        behavior = max(cnn_scores.items(), key=lambda x: x[1])[0]
+        prediction['rule_based'] = {
+            'behavior': prediction['behavior'],
+            'confidence': prediction['confidence'],
+            'scores': prediction['scores']
+        }
+        prediction['cnn'] = {
+            'behavior': behavior,
+            'confidence': cnn_scores[behavior],
+            'scores': cnn_scores
+        }
+        prediction.update(prediction['cnn'])
+        prediction['analysis'] = self.feature_extractor._get_analysis(behavior, features)
+        prediction['mode'] = 'cnn'
+        return prediction
+
+    def cache_fingerprint(self):
+        """Identify the weights and extractor parameters predictions depend on"""
+        params = json.dumps({
+            'extractor': vars(self.feature_extractor),
+            'features_version': self.feature_extractor.FEATURES_VERSION,
+            'max_side': self.max_side,
+            'decoder': 'cv2',
+            'tiles': (self.tile_size, self.tile_overlap),
+            'arch': self.arch,
+            'weights': self._weights_id,
+            'artifact': self.cnn_artifact
+        }, sort_keys=True, default=str)
+        return hashlib.blake2b(params.encode(), digest_size=8).hexdigest()
+
+    def _cache_key(self, image_hash, mode):
+        return image_hash if mode == 'rules' else f'{image_hash}.{mode}'
+
+    def cache_lookup(self, image_hash, mode='rules'):
+        """Return a cached prediction after checking the cache is still valid"""
+        self.cache.set_fingerprint(self.cache_fingerprint())
+        return self.cache.get(self._cache_key(image_hash, mode))
+
+    def cache_store(self, image_hash, mode, prediction):
+        self.cache.put(self._cache_key(image_hash, mode), prediction)
+
+    def close(self):
+        """Shut down the batch worker and tile pools"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._tile_pool is not None:
+            self._tile_pool.shutdown()
+            self._tile_pool = None
+
+    def _get_tile_pool(self):
+        """Threads for tiles: cv2 and numpy release the GIL, and tiles share the decoded rows"""
+        if self._tile_pool is None:
+            with self._network_lock:
+                if self._tile_pool is None:
+                    self._tile_pool = ThreadPoolExecutor(max_workers=self.tile_workers, thread_name_prefix='tile')
+        return self._tile_pool
+
+    def _get_pool(self):
+        """Create the batch worker pool on first use"""
+        if self._pool is None:
+            with self._network_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.batch_workers,
+                        initializer=_init_batch_worker,
+                        initargs=(self.feature_extractor, self.max_side)
+                    )
+        return self._pool
+
+    def _discard_pool(self, pool):
+        """Drop a broken batch pool so the next batch creates a new one"""
+        with self._network_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _build_prediction(self, features, image_hash=None):
+        """Turn extracted features into the prediction payload"""
+        # Get rule-based prediction
+        prediction = self.feature_extractor.predict_behavior_from_features(features)
+        
+        # Add feature details
+        prediction.update({
+            'slant_angle': features['slant_angle'],
+            'avg_size': features['letter_size'],
+            'stroke': features['stroke_width'],
+            'pressure': features['pressure'],
+            'spacing': features['spacing'],
+            'image_hash': image_hash
+        })
+        
+        return prediction
+
+    def error_prediction(self, error, image_hash=None):
+        """Prediction payload for an image that could not be processed"""
+        return {
+            'behavior': 'Unknown',
+            'confidence': 0.0,
+            'scores': {},
+            'image_hash': image_hash,
+            'error': str(error)
+        }
+
+# Where scripts/train_model.py saves the trained CNN
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models', 'handwriting_model.pth')
+
+def default_model_path():
+    """MODEL_PATH, or the default training output when it exists"""
+    path = os.environ.get('MODEL_PATH')
+    if path:
+        return path
+    return DEFAULT_MODEL_PATH if os.path.exists(DEFAULT_MODEL_PATH) else None
 
 # Global model instance
 _model = None
@@ -240,5 +1256,5 @@ def get_model():
     """Singleton pattern for model loading"""
     global _model
     if _model is None:
-        _model = BehaviorDetectionModel()
+        _model = BehaviorDetectionModel(model_path=default_model_path())
     return _model
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def content_hash(image_bytes):
+    """Fast content hash of uploaded image bytes"""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+class PredictionCache:
+    """Two-tier prediction cache keyed by image content hash.
+
+    The memory tier is an LRU bounded by entry count and TTL. The optional
+    disk tier stores one JSON file per entry under a directory named after
+    the model fingerprint, so it survives restarts and is naturally
+    invalidated when weights or extractor parameters change.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, cache_dir=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.fingerprint = ''
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def set_fingerprint(self, fingerprint):
+        """Invalidate all cached predictions if the model fingerprint changed"""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self.fingerprint = fingerprint
+                self._entries.clear()
+
+    def get(self, key):
+        """Return a cached prediction or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, prediction = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    self._counters['memory_hits'] += 1
+                    return json.loads(prediction)
+                del self._entries[key]
+
+        prediction = self._disk_get(key, now)
+        with self._lock:
+            if prediction is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['hits'] += 1
+            self._counters['disk_hits'] += 1
+            self._memory_put(key, json.dumps(prediction), now)
+        return prediction
+
+    def put(self, key, prediction):
+        """Cache a prediction in both tiers"""
+        now = time.time()
+        # Serialized copies keep callers from mutating cached entries
+        payload = json.dumps(prediction)
+        with self._lock:
+            self._memory_put(key, payload, now)
+        self._disk_put(key, payload)
+
+    def clear(self):
+        """Drop the memory tier"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': self._counters['hits'] / lookups if lookups else 0,
+                'disk_enabled': self.cache_dir is not None
+            }
+
+    def _memory_put(self, key, payload, now):
+        self._entries[key] = (now, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, self.fingerprint, key[:2], f'{key}.json')
+
+    def _disk_get(self, key, now):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key, payload):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write prediction cache entry: {e}")
@@ -0,0 +1,165 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+class PredictionStore:
+    """Base class for prediction storage with running stats aggregates"""
+
+    def add(self, prediction):
+        raise NotImplementedError
+
+    def recent(self, limit=50):
+        """Most recent predictions, oldest first"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Totals, behavior distribution and average confidence"""
+        raise NotImplementedError
+
+    def _format_stats(self, total, counts, confidence_sum):
+        return {
+            'total_predictions': total,
+            'behavior_distribution': counts,
+            'average_confidence': confidence_sum / total if total else 0
+        }
+
+class MemoryPredictionStore(PredictionStore):
+    """Bounded in-memory ring buffer.
+
+    Aggregates cover the predictions currently held: they are updated on
+    insert and on eviction, so stats never rescan the buffer.
+    """
+
+    def __init__(self, capacity=10000):
+        self._items = deque(maxlen=capacity)
+        self._counts = {}
+        self._confidence_sum = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, prediction):
+        with self._lock:
+            if len(self._items) == self._items.maxlen:
+                self._account(self._items[0], -1)
+            self._items.append(prediction)
+            self._account(prediction, 1)
+
+    def recent(self, limit=50):
+        with self._lock:
+            limit = max(0, min(limit, len(self._items)))
+            # Walk back from the newest entry instead of copying the buffer
+            items = [self._items[-i] for i in range(limit, 0, -1)]
+        return items
+
+    def stats(self):
+        with self._lock:
+            return self._format_stats(len(self._items), dict(self._counts), self._confidence_sum)
+
+    def _account(self, prediction, sign):
+        behavior = prediction.get('behavior', 'Unknown')
+        count = self._counts.get(behavior, 0) + sign
+        if count:
+            self._counts[behavior] = count
+        else:
+            self._counts.pop(behavior, None)
+        self._confidence_sum += sign * prediction.get('confidence', 0)
+
+class SQLitePredictionStore(PredictionStore):
+    """SQLite-backed store following the predictions schema in database.json.
+
+    A prediction_stats table holding per-behavior counts and confidence sums
+    is updated in the same transaction as each insert.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS predictions (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      user_id TEXT,
+      behavior TEXT NOT NULL,
+      confidence REAL NOT NULL,
+      scores JSON NOT NULL,
+      slant_angle REAL,
+      avg_size REAL,
+      stroke REAL,
+      analysis TEXT,
+      image_hash TEXT,
+      payload JSON,
+      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_predictions_behavior ON predictions(behavior);
+    CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions(created_at);
+    CREATE INDEX IF NOT EXISTS idx_predictions_user_id ON predictions(user_id);
+    CREATE INDEX IF NOT EXISTS idx_predictions_image_hash ON predictions(image_hash);
+    CREATE TABLE IF NOT EXISTS prediction_stats (
+      behavior TEXT PRIMARY KEY,
+      count INTEGER NOT NULL DEFAULT 0,
+      confidence_sum REAL NOT NULL DEFAULT 0
+    );
+    """
+
+    def __init__(self, path='predictions.db'):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        conn.executescript(self.SCHEMA)
+        conn.commit()
+
+    def _connection(self):
+        """One connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, prediction):
+        now = prediction.get('timestamp') or datetime.now().isoformat()
+        behavior = prediction.get('behavior', 'Unknown')
+        confidence = prediction.get('confidence', 0)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """INSERT INTO predictions (user_id, behavior, confidence, scores, slant_angle, avg_size,
+                                            stroke, analysis, image_hash, payload, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (prediction.get('user_id'), behavior, confidence,
+                 json.dumps(prediction.get('scores', {})), prediction.get('slant_angle'),
+                 prediction.get('avg_size'), prediction.get('stroke'), prediction.get('analysis'),
+                 prediction.get('image_hash'), json.dumps(prediction), now, now)
+            )
+            conn.execute(
+                """INSERT INTO prediction_stats (behavior, count, confidence_sum) VALUES (?, 1, ?)
+                   ON CONFLICT(behavior) DO UPDATE SET count = count + 1,
+                                                       confidence_sum = confidence_sum + excluded.confidence_sum""",
+                (behavior, confidence)
+            )
+
+    def recent(self, limit=50):
+        # Served newest-first from the primary key index, then put back in order
+        rows = self._connection().execute(
+            'SELECT payload FROM predictions ORDER BY id DESC LIMIT ?', (max(0, limit),)
+        ).fetchall()
+        return [json.loads(payload) for (payload,) in reversed(rows)]
+
+    def stats(self):
+        rows = self._connection().execute(
+            'SELECT behavior, count, confidence_sum FROM prediction_stats'
+        ).fetchall()
+        counts = {behavior: count for behavior, count, _ in rows if count}
+        return self._format_stats(sum(counts.values()), counts, sum(row[2] for row in rows))
+
+def create_store():
+    """Build the prediction store selected by PREDICTION_STORE (memory or sqlite)"""
+    backend = os.environ.get('PREDICTION_STORE', 'memory')
+    if backend == 'sqlite':
+        return SQLitePredictionStore(os.environ.get('PREDICTION_DB', 'predictions.db'))
+    if backend == 'memory':
+        return MemoryPredictionStore(int(os.environ.get('PREDICTION_STORE_SIZE', 10000)))
+    raise ValueError(f"Unknown prediction store: {backend}")
@@ -0,0 +1,105 @@
+import io
+import os
+
+# Largest accepted image file; enforced while reading, before decoding
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 20 * 2**20))
+
+# Multi-page and very large scans sent to the tiled document endpoint
+MAX_DOCUMENT_BYTES = int(os.environ.get('MAX_DOCUMENT_BYTES', 200 * 2**20))
+
+READ_CHUNK = 256 * 1024
+
+# Leading bytes of the formats the decoder accepts
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+HEADER_BYTES = 12
+
+class UploadError(ValueError):
+    """Rejected upload, carrying the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def sniff_format(header):
+    """Image format from the first bytes of a file, or None if unsupported"""
+    header = bytes(header[:HEADER_BYTES])
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    for signature, fmt in SIGNATURES:
+        if header.startswith(signature):
+            return fmt
+    return None
+
+def _remaining_size(stream):
+    """Bytes left in a seekable stream, or None when it cannot seek"""
+    try:
+        position = stream.tell()
+        end = stream.seek(0, io.SEEK_END)
+        stream.seek(position)
+        return end - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def read_upload(stream, max_bytes=None):
+    """Read an uploaded image into a single buffer, enforcing size and format.
+
+    The stream is read with `readinto` straight into one bytearray, sized up
+    front when the stream can report its length, so the upload is never
+    joined from chunks or copied into a separate `bytes`. The header is
+    checked as soon as it arrives and oversized uploads are rejected before
+    (or while) reading. Raises UploadError with 413 or 415.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    size = _remaining_size(stream)
+    if size is not None and size > max_bytes:
+        raise UploadError(f'File too large (max {max_bytes} bytes)', 413)
+
+    # One spare byte lets a non-seekable stream prove it overran the limit
+    buffer = bytearray(size if size is not None else min(READ_CHUNK, max_bytes + 1))
+    view = memoryview(buffer)
+    length = 0
+    sniffed = False
+    readinto = getattr(stream, 'readinto', None)
+
+    while True:
+        if length == len(buffer):
+            if size is not None or length > max_bytes:
+                break
+            view.release()
+            buffer.extend(bytes(min(len(buffer), max_bytes + 1 - length)))
+            view = memoryview(buffer)
+        if readinto is not None:
+            n = readinto(view[length:])
+        else:
+            chunk = stream.read(len(buffer) - length)
+            n = len(chunk)
+            view[length:length + n] = chunk
+        if not n:
+            break
+        length += n
+
+        if length > max_bytes:
+            view.release()
+            raise UploadError(f'File too large (max {max_bytes} bytes)', 413)
+        if not sniffed and length >= HEADER_BYTES:
+            if sniff_format(view[:HEADER_BYTES]) is None:
+                view.release()
+                raise UploadError('Unsupported image format', 415)
+            sniffed = True
+
+    view.release()
+    if not sniffed and (length == 0 or sniff_format(buffer[:length]) is None):
+        raise UploadError('Empty file' if length == 0 else 'Unsupported image format', 400 if length == 0 else 415)
+
+    # Shrinking in place avoids copying the payload
+    del buffer[length:]
+    return buffer
@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from model import HandwritingFeatureExtractor
+from synthetic_handwriting import render_page
+
+def margin_page(width, height, fill, seed=0):
+    """A block of writing covering `fill` of the page area, centred on blank paper"""
+    page = np.full((height, width), 245, dtype=np.uint8)
+    block_w, block_h = max(64, int(width * fill ** 0.5)), max(64, int(height * fill ** 0.5))
+    x, y = (width - block_w) // 2, (height - block_h) // 2
+    page[y:y + block_h, x:x + block_w] = render_page(block_w, block_h, seed=seed)
+    return page
+
+def median_ms(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples) * 1000)
+
+def report(width, height, fills, runs):
+    """Pixels removed, extraction latency and rule-based scores with and without auto-crop"""
+    plain = HandwritingFeatureExtractor(autocrop=False)
+    cropped = HandwritingFeatureExtractor(autocrop=True)
+    rows = []
+    for fill in fills:
+        page = margin_page(width, height, fill)
+        crop = cropped.crop_to_ink(page)
+        features = {name: e.extract_features(page) for name, e in (('full', plain), ('crop', cropped))}
+        predictions = {name: plain.predict_behavior_from_features(f) for name, f in features.items()}
+        rows.append({
+            'fill': fill,
+            'removed_pct': 100 * (1 - crop.size / page.size),
+            'crop_ms': median_ms(lambda: cropped.crop_to_ink(page), runs),
+            'full_ms': median_ms(lambda: plain.extract_features(page), runs),
+            'cropped_ms': median_ms(lambda: cropped.extract_features(page), runs),
+            'features': features,
+            'behavior': {name: p['behavior'] for name, p in predictions.items()}
+        })
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Effect of ink bounding-box auto-crop on cost and rule-based scores')
+    parser.add_argument('--width', type=int, default=2048)
+    parser.add_argument('--height', type=int, default=1536)
+    parser.add_argument('--fills', type=float, nargs='+', default=[1.0, 0.5, 0.25, 0.1, 0.03])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.width}x{args.height} pages, writing block covering the given share of the page")
+    print(f"{'fill':>5} {'removed':>8} {'crop':>7} {'full':>8} {'cropped':>8} {'speedup':>7}  "
+          f"{'stroke full/crop':>17} {'pressure full/crop':>19}  behavior")
+    for r in report(args.width, args.height, args.fills, args.runs):
+        full, crop = r['features']['full'], r['features']['crop']
+        print(f"{r['fill']:>5.2f} {r['removed_pct']:>7.1f}% {r['crop_ms']:>5.1f}ms {r['full_ms']:>6.1f}ms "
+              f"{r['cropped_ms']:>6.1f}ms {r['full_ms'] / r['cropped_ms']:>6.2f}x  "
+              f"{full['stroke_width']:>8.2f}/{crop['stroke_width']:<8.2f} {full['pressure']:>9.2f}/{crop['pressure']:<9.2f}  "
+              f"{r['behavior']['full']} -> {r['behavior']['crop']}")
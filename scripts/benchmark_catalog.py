@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from dataset_manager import DatasetManager
+
+def legacy_add_images(metadata_path, filenames):
+    """The pre-catalog add_images bookkeeping: re-read and rewrite the whole JSON"""
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    metadata['images'].extend(filenames)
+    metadata['image_count'] = len(metadata['images'])
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+def legacy_list_datasets(metadata_dir):
+    datasets = []
+    for file in os.listdir(metadata_dir):
+        if file.endswith('.json'):
+            with open(os.path.join(metadata_dir, file), 'r') as f:
+                datasets.append(json.load(f))
+    return datasets
+
+def benchmark(total_images, batch, datasets):
+    """Catalog bookkeeping cost vs. the legacy JSON files (file copies excluded)"""
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        # Legacy: one JSON per dataset, whole file rewritten per add
+        metadata_dir = os.path.join(root, 'legacy')
+        os.makedirs(metadata_dir)
+        paths = []
+        for d in range(datasets):
+            path = os.path.join(metadata_dir, f'{d}.json')
+            with open(path, 'w') as f:
+                json.dump({'id': str(d), 'name': f'set {d}', 'behavior': 'Calm', 'description': '',
+                           'created_at': str(d), 'image_count': 0, 'images': []}, f)
+            paths.append(path)
+
+        start = time.perf_counter()
+        for i in range(0, total_images, batch):
+            legacy_add_images(paths[0], [f'img_{j:06d}.jpg' for j in range(i, min(i + batch, total_images))])
+        results['legacy_add'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy_list_datasets(metadata_dir)
+        results['legacy_list'] = time.perf_counter() - start
+
+        # Catalog
+        manager = DatasetManager(base_dir=os.path.join(root, 'datasets'))
+        ids = []
+        for d in range(datasets):
+            dataset_id = f'bench-{d:04d}'
+            manager.catalog.create_dataset(dataset_id, f'set {d}', 'Calm', '', dataset_id)
+            ids.append(dataset_id)
+
+        start = time.perf_counter()
+        for i in range(0, total_images, batch):
+            manager.catalog.add_images(ids[0], [(f'img_{j:06d}.jpg', None) for j in range(i, min(i + batch, total_images))])
+        results['catalog_add'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manager.list_datasets(offset=0, limit=50)
+        results['catalog_list_page'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manager.list_images(ids[0], offset=total_images // 2, limit=100)
+        results['catalog_image_page'] = time.perf_counter() - start
+
+        # Migration of the legacy files into a fresh catalog
+        migrate_root = os.path.join(root, 'migrate')
+        os.makedirs(os.path.join(migrate_root, 'metadata'))
+        for path in paths:
+            os.replace(path, os.path.join(migrate_root, 'metadata', os.path.basename(path)))
+        start = time.perf_counter()
+        DatasetManager(base_dir=migrate_root)
+        results['migration'] = time.perf_counter() - start
+
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dataset catalog vs legacy JSON metadata')
+    parser.add_argument('--images', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=1000, help='images per add_images call')
+    parser.add_argument('--datasets', type=int, default=100)
+    args = parser.parse_args()
+
+    results = benchmark(args.images, args.batch, args.datasets)
+    print(f"{args.images} images added {args.batch} at a time, {args.datasets} datasets")
+    for name, seconds in results.items():
+        print(f"{name:>20}: {seconds * 1000:10.1f}ms")
@@ -0,0 +1,64 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from model import HandwritingFeatureExtractor, decode_image
+from synthetic_handwriting import render_page, encode
+
+def _run(image_bytes, max_side, runs):
+    """Decode and extract features in a fresh process, returning latency and memory"""
+    extractor = HandwritingFeatureExtractor()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+
+    tracemalloc.start()
+    for _ in range(runs):
+        start = time.perf_counter()
+        gray, scale = decode_image(image_bytes, max_side)
+        features = extractor.extract_features(gray, scale)
+        latencies.append(time.perf_counter() - start)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'max_side': max_side or 'full',
+        'working_size': f'{gray.shape[1]}x{gray.shape[0]}',
+        'latency_ms': float(np.median(latencies) * 1000),
+        'peak_rss_delta_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss) / 1024,
+        'peak_traced_mb': traced_peak / 2**20,
+        'letter_size': features['letter_size'],
+        'spacing': features['spacing']
+    }
+
+def benchmark(width, height, caps, runs):
+    """Compare full-resolution decoding with capped working resolutions"""
+    image_bytes = encode(render_page(width, height))
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for max_side in caps:
+        # One process per configuration so peak RSS is not shared
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(_run, (image_bytes, max_side, runs)))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Decode latency and peak memory by working resolution')
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--caps', type=int, nargs='+', default=[0, 2048, 1024])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.width}x{args.height} JPEG, {args.runs} runs per setting")
+    for r in benchmark(args.width, args.height, args.caps, args.runs):
+        print(f"max_side={r['max_side']:>5} working={r['working_size']:>10} "
+              f"latency={r['latency_ms']:8.1f}ms peak_rss+={r['peak_rss_delta_mb']:7.1f}MB "
+              f"traced={r['peak_traced_mb']:7.1f}MB letter_size={r['letter_size']:.1f} spacing={r['spacing']:.2f}")
@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import torch
+
+from synthetic_handwriting import render_page, encode
+from train_model import batch_augment, build_dataloader, build_dataset
+
+def make_corpus(root, count, width=800, height=600):
+    """Write a synthetic JPEG training set and labels file"""
+    image_dir = os.path.join(root, 'images')
+    os.makedirs(image_dir)
+    labels_file = os.path.join(root, 'labels.csv')
+    with open(labels_file, 'w') as f:
+        for i in range(count):
+            name = f'sample_{i:05d}.jpg'
+            with open(os.path.join(image_dir, name), 'wb') as img:
+                img.write(encode(render_page(width, height, seed=i)))
+            f.write(f'{name},{i % 5}\n')
+    return image_dir, labels_file
+
+def throughput(dataloader, pipeline, epochs=2):
+    """Images per second over full epochs, including batched augmentation"""
+    images_seen = 0
+    next(iter(dataloader))  # start workers outside the timed region
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for images, _ in dataloader:
+            if pipeline == 'batched':
+                images = batch_augment(images)
+            images_seen += images.size(0)
+    return images_seen / (time.perf_counter() - start)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Training input pipeline throughput (images/sec)')
+    parser.add_argument('--images', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--input-size', type=int, default=224)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 4, os.cpu_count() or 1])
+    parser.add_argument('--epochs', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        image_dir, labels_file = make_corpus(root, args.images)
+        cache_dir = os.path.join(root, 'cache')
+
+        configs = [('per_image', None, 0)]  # original pipeline
+        for workers in sorted(set(args.workers)):
+            configs.append(('per_image', None, workers))
+            configs.append(('batched', None, workers))
+            configs.append(('batched', cache_dir, workers))
+        # --workers 0 repeats the original pipeline; run each configuration once
+        configs = list(dict.fromkeys(configs))
+
+        for pipeline, cache, workers in configs:
+            dataset = build_dataset(image_dir, labels_file, args.input_size, cache, pipeline)
+            dataloader = build_dataloader(dataset, args.batch_size, num_workers=workers)
+            rate = throughput(dataloader, pipeline, args.epochs)
+            source = 'mmap cache' if cache else 'jpeg decode'
+            print(f"pipeline={pipeline:>9} source={source:>11} workers={workers:>3}: {rate:8.1f} images/sec")
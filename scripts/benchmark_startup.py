@@ -0,0 +1,45 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# Runs in a fresh interpreter so import costs and RSS are measured cold
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from model import get_model
+model = get_model()
+if {eager}:
+    model.model
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'startup_ms': elapsed * 1000,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'torch_imported': 'torch' in sys.modules
+}}))
+"""
+
+def measure(eager, runs):
+    """Median startup time and peak RSS of a fresh worker"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(eager=eager)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    samples.sort(key=lambda s: s['startup_ms'])
+    return samples[len(samples) // 2]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Worker startup time and RSS, lazy vs eager CNN')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for label, eager in (('lazy (rules only)', False), ('eager CNN', True)):
+        result = measure(eager, args.runs)
+        print(f"{label:>18}: startup={result['startup_ms']:8.1f}ms max_rss={result['max_rss_mb']:7.1f}MB "
+              f"torch_imported={result['torch_imported']}")
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import cv2
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from model import BehaviorDetectionModel, HandwritingFeatureExtractor, decode_image
+from synthetic_handwriting import render_page, encode
+
+# Corpus axes: working resolution, slant in degrees, ink density
+RESOLUTIONS = {'small': (1024, 768), 'medium': (2048, 1536), 'large': (4032, 3024)}
+SLANTS = (-15.0, 0.0, 15.0)
+DENSITIES = (0.5, 1.0, 2.0)
+
+STAGES = ('slant_angle', 'letter_size', 'stroke_width', 'pressure', 'spacing')
+
+def timed(fn, runs, warmup=1, setup=None):
+    """Median, p90 and min wall time of `fn` in milliseconds"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': float(np.median(samples)),
+        'p90_ms': float(np.percentile(samples, 90)),
+        'min_ms': float(np.min(samples)),
+        'runs': runs
+    }
+
+def build_corpus(resolutions, slants, densities):
+    """Deterministic pages, one per (resolution, slant, density) combination"""
+    corpus = {}
+    for size_name in resolutions:
+        width, height = RESOLUTIONS[size_name]
+        for slant in slants:
+            for density in densities:
+                page = render_page(width, height, seed=7, slant=slant, density=density)
+                corpus[f'{size_name}/slant{slant:+g}/density{density:g}'] = page
+    return corpus
+
+def bench_extractor(corpus, runs):
+    """Each _calculate_* stage, and the fused extractor, per corpus image"""
+    extractor = HandwritingFeatureExtractor()
+    results = {}
+    for name, gray in corpus.items():
+        for stage in STAGES:
+            method = getattr(extractor, f'_calculate_{stage}')
+            results[f'stage.{stage}/{name}'] = timed(lambda: method(gray), runs)
+        results[f'extract_features/{name}'] = timed(lambda: extractor.extract_features(gray), runs)
+    return results
+
+def bench_predict(corpus, runs):
+    """End-to-end predict (decode + features + scoring) on JPEG bytes, cache cleared per run"""
+    model = BehaviorDetectionModel(prediction_mode='rules')
+    results = {}
+    for name, gray in corpus.items():
+        image_bytes = encode(gray)
+        results[f'decode/{name}'] = timed(lambda: decode_image(image_bytes, model.max_side), runs)
+        results[f'predict/{name}'] = timed(lambda: model.predict(image_bytes), runs, setup=model.cache.clear)
+    model.close()
+    return results
+
+def bench_cnn(arch, batch_sizes, runs):
+    """CNN forward passes at several batch sizes (random weights and inputs)"""
+    try:
+        import torch
+        from cnn import build_model, default_input_size
+    except ImportError as e:
+        print(f"Skipping CNN benchmarks: {e}")
+        return {}
+
+    network = build_model(arch).eval()
+    size = default_input_size(arch)
+    results = {}
+    for batch_size in batch_sizes:
+        inputs = torch.randn(batch_size, 1, size, size)
+
+        def forward():
+            with torch.inference_mode():
+                network(inputs)
+
+        result = timed(forward, runs, warmup=2)
+        result['per_image_ms'] = result['median_ms'] / batch_size
+        results[f'cnn.{arch}/batch{batch_size}'] = result
+    return results
+
+def bench_datasets(images, runs):
+    """DatasetManager create/add/list/export/delete on a directory of JPEGs"""
+    from dataset_manager import DatasetManager
+
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, 'source')
+        os.makedirs(source)
+        paths = []
+        for i in range(images):
+            path = os.path.join(source, f'page_{i:04d}.jpg')
+            with open(path, 'wb') as f:
+                f.write(encode(render_page(640, 480, seed=i)))
+            paths.append(path)
+
+        manager = DatasetManager(os.path.join(root, 'datasets'))
+        state = {}
+
+        def create():
+            state['id'] = manager.create_dataset(f'bench {time.perf_counter_ns()}', 'Calm')
+
+        def add():
+            manager.add_images(state['id'], paths)
+
+        def export():
+            manager.export_dataset(state['id'], os.path.join(root, 'exports', str(time.perf_counter_ns())))
+
+        def delete():
+            manager.delete_dataset(state['id'])
+
+        results['datasets.create'] = timed(create, runs, setup=lambda: state.get('id') and delete())
+        results[f'datasets.add_images/{images}'] = timed(add, runs, setup=lambda: (delete(), create()))
+        results[f'datasets.list_images/{images}'] = timed(lambda: manager.list_images(state['id']), runs)
+        results[f'datasets.export/{images}'] = timed(export, runs)
+        results[f'datasets.delete/{images}'] = timed(delete, runs, setup=lambda: (create(), add()))
+    return results
+
+def environment():
+    """Where the numbers came from; comparisons across machines are not meaningful"""
+    env = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__
+    }
+    try:
+        import torch
+        env['torch'] = torch.__version__
+    except ImportError:
+        pass
+    return env
+
+def run(args):
+    corpus = build_corpus(args.resolutions, args.slants, args.densities)
+    results = {}
+    if 'extractor' in args.groups:
+        results.update(bench_extractor(corpus, args.runs))
+    if 'predict' in args.groups:
+        results.update(bench_predict(corpus, args.runs))
+    if 'cnn' in args.groups:
+        results.update(bench_cnn(args.arch, args.batch_sizes, args.runs))
+    if 'datasets' in args.groups:
+        results.update(bench_datasets(args.dataset_images, args.runs))
+    return {'environment': environment(), 'results': results}
+
+def compare(baseline_path, current_path, threshold):
+    """Print per-benchmark ratios and return the names that regressed beyond `threshold`"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)['results']
+    with open(current_path, 'r') as f:
+        current = json.load(f)['results']
+
+    regressions = []
+    print(f"{'benchmark':<55} {'base ms':>9} {'new ms':>9} {'ratio':>7}")
+    for name in sorted(set(baseline) & set(current)):
+        before, after = baseline[name]['median_ms'], current[name]['median_ms']
+        ratio = after / before if before else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print(f"{name:<55} {before:>9.2f} {after:>9.2f} {ratio:>7.2f}{flag}")
+
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"{name:<55} only in {'baseline' if name in baseline else 'current'}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark suite on a deterministic synthetic handwriting corpus')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='run benchmarks and write JSON results')
+    run_parser.add_argument('--output', default='benchmark_results.json')
+    run_parser.add_argument('--groups', nargs='+', default=['extractor', 'predict', 'cnn', 'datasets'],
+                            choices=['extractor', 'predict', 'cnn', 'datasets'])
+    run_parser.add_argument('--resolutions', nargs='+', default=['small', 'medium'], choices=list(RESOLUTIONS))
+    run_parser.add_argument('--slants', type=float, nargs='+', default=list(SLANTS))
+    run_parser.add_argument('--densities', type=float, nargs='+', default=list(DENSITIES))
+    run_parser.add_argument('--runs', type=int, default=10)
+    run_parser.add_argument('--arch', default='baseline')
+    run_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 16, 32])
+    run_parser.add_argument('--dataset-images', type=int, default=200)
+
+    compare_parser = subparsers.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='relative slowdown of the median reported as a regression')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        report = run(args)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(report['results'])} benchmarks to {args.output}")
+    elif args.command == 'compare':
+        regressions = compare(args.baseline, args.current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        parser.print_help()
@@ -0,0 +1,78 @@
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from model import BehaviorDetectionModel, HandwritingFeatureExtractor, iter_pages
+from synthetic_handwriting import render_page
+
+def make_document(width, height, pages):
+    """Multi-page LZW TIFF of synthetic handwriting (strips, so the tiled path decodes it in bands)"""
+    frames = [Image.fromarray(render_page(width, height, seed=i, style='cursive', slant=5 * i)) for i in range(pages)]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format='TIFF', save_all=True, append_images=frames[1:], compression='tiff_lzw')
+    return buffer.getvalue()
+
+def _whole(document, tile_size):
+    """Pages decoded whole one at a time, features on each whole page at once"""
+    extractor = HandwritingFeatureExtractor()
+    return [extractor.extract_features(gray) for _, gray in iter_pages(document)]
+
+def _tiled(document, tile_size):
+    model = BehaviorDetectionModel(batch_workers=1)
+    model.tile_size = tile_size
+    prediction = model.predict_document(document)
+    model.close()
+    return prediction
+
+def _run(path, document, tile_size):
+    """Run one path in a fresh process, returning latency, peak RSS growth and its result"""
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    result = {'whole': _whole, 'tiled': _tiled}[path](document, tile_size)
+    return {
+        'path': path,
+        'latency_ms': (time.perf_counter() - start) * 1000,
+        'peak_rss_delta_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss) / 1024,
+        'result': result
+    }
+
+def benchmark(width, height, pages, tile_size):
+    document = make_document(width, height, pages)
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for path in ('whole', 'tiled'):
+        # One process per path so peak RSS is not shared
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(_run, (path, document, tile_size)))
+    return len(document), results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Peak memory and latency of tiled multi-page processing')
+    parser.add_argument('--width', type=int, default=6000)
+    parser.add_argument('--height', type=int, default=4500)
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--tile-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    size, results = benchmark(args.width, args.height, args.pages, args.tile_size)
+    print(f"{args.pages} pages of {args.width}x{args.height}, {size / 2**20:.1f}MB TIFF, tile={args.tile_size} rows")
+    for r in results:
+        print(f"{r['path']:>6} latency={r['latency_ms']:8.1f}ms peak_rss+={r['peak_rss_delta_mb']:7.1f}MB")
+
+    whole = results[0]['result']
+    tiled = results[1]['result']
+    print(f"{'page':>4} {'letter size whole/tiled':>24} {'stroke whole/tiled':>20} {'slant whole/tiled':>18}  behavior")
+    for features, page in zip(whole, tiled['pages']):
+        print(f"{page['page']:>4} {features['letter_size']:>11.2f}/{page['avg_size']:<11.2f} "
+              f"{features['stroke_width']:>9.3f}/{page['stroke']:<9.3f} "
+              f"{features['slant_angle']:>8.1f}/{page['slant_angle']:<8.1f}  {page['behavior']}")
+    print(f"document: {tiled['behavior']} ({tiled['confidence']:.2f}) over {tiled['page_count']} pages")
@@ -0,0 +1,91 @@
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from model import HandwritingFeatureExtractor, decode_image
+from uploads import read_upload
+from synthetic_handwriting import render_page, encode
+
+def _read_then_pil(stream, max_side):
+    """Previous request path: read() into bytes, BytesIO, PIL draft decode, array copy"""
+    image = Image.open(io.BytesIO(stream.read()))
+    original_side = max(image.size)
+    if max_side and original_side > max_side:
+        ratio = max_side / original_side
+        image.draft('L', (max(1, int(image.size[0] * ratio)), max(1, int(image.size[1] * ratio))))
+    image = image.convert('L')
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.BILINEAR)
+    return np.array(image), original_side / max(image.size)
+
+def _stream_then_cv2(stream, max_side):
+    """Current request path: size-checked readinto one buffer, zero-copy cv2 decode"""
+    return decode_image(read_upload(stream), max_side)
+
+PATHS = {'read+pil': _read_then_pil, 'stream+cv2': _stream_then_cv2}
+
+def _run(path_name, upload_path, max_side, runs):
+    """Serve one upload repeatedly in a fresh process, returning latency and memory"""
+    handler = PATHS[path_name]
+    extractor = HandwritingFeatureExtractor()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+
+    tracemalloc.start()
+    for _ in range(runs):
+        # Uploads arrive spooled to a temporary file, as werkzeug and starlette store them
+        with open(upload_path, 'rb') as stream:
+            start = time.perf_counter()
+            gray, scale = handler(stream, max_side)
+            extractor.extract_features(gray, scale)
+            latencies.append(time.perf_counter() - start)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'path': path_name,
+        'latency_ms': float(np.median(latencies) * 1000),
+        'peak_rss_delta_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss) / 1024,
+        'peak_traced_mb': traced_peak / 2**20
+    }
+
+def benchmark(width, height, fmt, max_side, runs):
+    """Compare peak per-request memory of the old and new upload paths"""
+    with tempfile.NamedTemporaryFile(suffix='.' + fmt.lower(), delete=False) as f:
+        f.write(encode(render_page(width, height), fmt))
+        upload_path = f.name
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    try:
+        for path_name in PATHS:
+            # One process per path so peak RSS is not shared
+            with ctx.Pool(1) as pool:
+                results.append(pool.apply(_run, (path_name, upload_path, max_side, runs)))
+    finally:
+        os.unlink(upload_path)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Peak per-request memory of the upload and decode path')
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--format', default='JPEG', choices=['JPEG', 'PNG'])
+    parser.add_argument('--max-side', type=int, default=2048)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.width}x{args.height} {args.format}, max_side={args.max_side}, {args.runs} runs per path")
+    for r in benchmark(args.width, args.height, args.format, args.max_side, args.runs):
+        print(f"{r['path']:>11} latency={r['latency_ms']:8.1f}ms "
+              f"peak_rss+={r['peak_rss_delta_mb']:7.1f}MB traced={r['peak_traced_mb']:7.1f}MB")
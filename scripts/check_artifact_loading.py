@@ -0,0 +1,46 @@
+import io
+import os
+import sys
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from cnn import build_model, save_checkpoint
+from export_model import export
+from synthetic_handwriting import render_page, encode
+
+def check_artifact_loading(arch='compact', preference='auto', expected='int8'):
+    """Start the Flask app against an exported checkpoint and confirm CNN mode serves the artifact"""
+    failures = []
+    with tempfile.TemporaryDirectory() as root:
+        checkpoint = os.path.join(root, 'handwriting_model.pth')
+        save_checkpoint(build_model(arch), checkpoint, arch)
+        export(checkpoint)
+
+        # The app builds its model from the environment at import time
+        os.environ['MODEL_PATH'] = checkpoint
+        os.environ['CNN_ARTIFACT'] = preference
+        from app import app
+        client = app.test_client()
+
+        image = encode(render_page(640, 480, seed=0))
+        response = client.post('/predict?mode=cnn', data={'file': (io.BytesIO(image), 'page.jpg')},
+                               content_type='multipart/form-data')
+        prediction = response.get_json()
+        health = client.get('/health').get_json()
+
+        if response.status_code != 200 or 'cnn' not in prediction or 'cnn_unavailable' in prediction:
+            failures.append(f"CNN prediction not served: {response.status_code} {prediction}")
+        if not health['cnn_trained']:
+            failures.append('/health reports no trained weights')
+        if health['cnn_artifact'] != expected:
+            failures.append(f"expected the {expected} artifact, server loaded {health['cnn_artifact']}")
+    return failures
+
+if __name__ == '__main__':
+    failures = check_artifact_loading()
+    for failure in failures:
+        print(failure)
+    print('Artifact loading OK' if not failures else f'{len(failures)} failures')
+    sys.exit(1 if failures else 0)
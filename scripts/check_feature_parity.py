@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from model import HandwritingFeatureExtractor
+
+def make_sample(rng, height=480, width=640, color=False):
+    """Draw random pen strokes on a noisy paper background"""
+    image = rng.integers(200, 256, size=(height, width), dtype=np.uint8)
+    for _ in range(rng.integers(5, 40)):
+        pts = rng.integers(0, [width, height], size=(rng.integers(2, 6), 2)).astype(np.int32)
+        ink = int(rng.integers(0, 120))
+        cv2.polylines(image, [pts], False, ink, int(rng.integers(1, 6)))
+    if color:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    return image
+
+def check_parity(samples=50, seed=0, tolerance=1e-9):
+    """Compare the fused extraction engine with the per-stage reference methods"""
+    rng = np.random.default_rng(seed)
+    extractor = HandwritingFeatureExtractor()
+    failures = []
+
+    for i in range(samples):
+        image = make_sample(rng, color=bool(i % 2))
+        fused = extractor.extract_features(image)
+        staged = extractor.extract_features_staged(image)
+
+        for key, expected in staged.items():
+            if abs(fused[key] - expected) > tolerance * max(1.0, abs(expected)):
+                failures.append((i, key, expected, fused[key]))
+
+    # Blank pages exercise the empty-mask branches
+    blank = np.full((100, 100), 255, dtype=np.uint8)
+    if extractor.extract_features(blank) != extractor.extract_features_staged(blank):
+        failures.append(('blank', None, None, None))
+
+    return failures
+
+if __name__ == '__main__':
+    failures = check_parity()
+    for failure in failures:
+        print(f"Mismatch on sample {failure[0]}, {failure[1]}: staged={failure[2]} fused={failure[3]}")
+    print('Feature parity OK' if not failures else f'{len(failures)} mismatches')
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,72 @@
+import os
+import sys
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from model import HandwritingFeatureExtractor, decode_image
+from synthetic_handwriting import render_page, encode
+
+# Working resolutions to compare against full resolution (MAX_IMAGE_SIDE values). Below
+# about 1024 px, a 1-2 px pen stroke averages lighter than the binarization threshold on a
+# 4000 px page and disappears, which no rescaling of the features can undo
+MAX_SIDES = (2048, 1024)
+
+# Allowed drift from the full-resolution value: (absolute, relative)
+TOLERANCES = {
+    'slant_angle': (3.0, 0.0),
+    'letter_size': (0.0, 0.05),
+    'stroke_width': (0.0, 0.12),
+    'pressure': (0.5, 0.0),
+    'spacing': (0.5, 0.25)
+}
+
+def column_page(width, height, seed):
+    """Blocks of writing separated by blank gutters of irregular width, so spacing is non-zero"""
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width), 245, dtype=np.uint8)
+    x = width // 20
+    while True:
+        block = int(rng.integers(width // 16, width // 6))
+        if x + block > width - width // 20:
+            break
+        page[height // 10:height - height // 10, x:x + block] = render_page(block, height - height // 5, seed=x)
+        x += block + int(rng.integers(width // 200, width // 25))
+    return page
+
+def pages(width=4000, height=3000):
+    yield 'cursive +12', render_page(width, height, seed=0, style='cursive', slant=12)
+    yield 'cursive -20', render_page(width, height, seed=1, style='cursive', slant=-20)
+    yield 'zigzag thin', render_page(width, height, seed=2, density=0.5)
+    yield 'gutters', column_page(width, height, seed=3)
+
+def check_invariance():
+    """Features of each page decoded at several working resolutions, against full resolution"""
+    extractor = HandwritingFeatureExtractor()
+    failures = []
+    for name, page in pages():
+        data = encode(page)
+        gray, scale = decode_image(data, 0)
+        reference = extractor.extract_features(gray, scale)
+        behavior = extractor.predict_behavior_from_features(reference)['behavior']
+        print(f"{name:>12} full: " + ' '.join(f"{k}={v:.2f}" for k, v in reference.items()) + f" -> {behavior}")
+        for max_side in MAX_SIDES:
+            gray, scale = decode_image(data, max_side)
+            features = extractor.extract_features(gray, scale)
+            drifted = []
+            for key, (absolute, relative) in TOLERANCES.items():
+                if abs(features[key] - reference[key]) > max(absolute, relative * abs(reference[key])):
+                    drifted.append(key)
+                    failures.append((name, max_side, key, reference[key], features[key]))
+            behavior = extractor.predict_behavior_from_features(features)['behavior']
+            print(f"{name:>12} {max_side:>4}: " + ' '.join(f"{k}={v:.2f}" for k, v in features.items())
+                  + f" -> {behavior}" + (f"  DRIFT {', '.join(drifted)}" if drifted else ''))
+    return failures
+
+if __name__ == '__main__':
+    failures = check_invariance()
+    for name, max_side, key, expected, actual in failures:
+        print(f"{name} at {max_side}px: {key} full={expected:.3f} working={actual:.3f}")
+    print('Resolution invariance OK' if not failures else f'{len(failures)} features outside tolerance')
+    sys.exit(1 if failures else 0)
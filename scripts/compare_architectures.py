@@ -0,0 +1,89 @@
+import argparse
+import io
+import os
+import sys
+import time
+import torch
+from torch.utils.data import DataLoader
+from torchvision import transforms
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from cnn import ARCHITECTURES, build_model, default_input_size, load_checkpoint
+from train_model import HandwritingDataset
+
+def checkpoint_size(model):
+    """Serialized state_dict size in bytes"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+def cpu_latency(model, input_size, batch_size, runs=20):
+    """Median forward-pass latency in milliseconds"""
+    x = torch.randn(batch_size, 1, input_size, input_size)
+    timings = []
+    with torch.inference_mode():
+        model(x)  # warm-up
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(x)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+def accuracy(model, input_size, image_dir, labels_file):
+    """Top-1 accuracy on a labelled image folder"""
+    transform = transforms.Compose([
+        transforms.Grayscale(num_output_channels=1),
+        transforms.Resize((input_size, input_size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.5], std=[0.5])
+    ])
+    dataset = HandwritingDataset(image_dir, labels_file, transform=transform, input_size=input_size)
+    if len(dataset) == 0:
+        return None
+    correct = 0
+    with torch.inference_mode():
+        for images, labels in DataLoader(dataset, batch_size=64):
+            correct += model(images).argmax(1).eq(labels).sum().item()
+    return 100.0 * correct / len(dataset)
+
+def compare(checkpoints, input_sizes, image_dir=None, labels_file=None, batch_sizes=(1, 16)):
+    torch.set_num_threads(os.cpu_count() or 1)
+    rows = []
+    for arch in ARCHITECTURES:
+        model = build_model(arch)
+        input_size = input_sizes.get(arch) or default_input_size(arch)
+        if arch in checkpoints:
+            _, input_size, state_dict = load_checkpoint(checkpoints[arch])
+            model.load_state_dict(state_dict)
+        model.eval()
+        rows.append({
+            'arch': arch,
+            'input_size': input_size,
+            'params': sum(p.numel() for p in model.parameters()),
+            'checkpoint_mb': checkpoint_size(model) / 2**20,
+            'latency_ms': {b: cpu_latency(model, input_size, b) for b in batch_sizes},
+            'accuracy': accuracy(model, input_size, image_dir, labels_file)
+            if arch in checkpoints and image_dir else None
+        })
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare CNN architectures: size, CPU latency and accuracy')
+    parser.add_argument('--checkpoint', action='append', default=[], metavar='ARCH=PATH',
+                        help='trained checkpoint for an architecture (repeatable)')
+    parser.add_argument('--input-size', action='append', default=[], metavar='ARCH=SIZE')
+    parser.add_argument('--image-dir')
+    parser.add_argument('--labels-file')
+    args = parser.parse_args()
+
+    checkpoints = dict(item.split('=', 1) for item in args.checkpoint)
+    input_sizes = {arch: int(size) for arch, size in (item.split('=', 1) for item in args.input_size)}
+
+    for row in compare(checkpoints, input_sizes, args.image_dir, args.labels_file):
+        latency = ' '.join(f"b{b}={ms:.1f}ms" for b, ms in row['latency_ms'].items())
+        acc = f"{row['accuracy']:.2f}%" if row['accuracy'] is not None else 'n/a'
+        print(f"{row['arch']:>9} input={row['input_size']:>3} params={row['params']:>11,} "
+              f"checkpoint={row['checkpoint_mb']:7.2f}MB {latency} accuracy={acc}")
@@ -1,149 +1,460 @@
+import argparse
+import io
 import os
 import json
+import hashlib
 import shutil
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+# Add backend directory to path (feature extraction for bulk ingestion)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+# Per-image analysis fields stored by bulk ingestion
+FEATURE_COLUMNS = ['width', 'height', 'slant_angle', 'letter_size', 'stroke_width', 'pressure', 'spacing']
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+def file_digest(path):
+    """SHA-256 of a file, read in 1 MiB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def analyze_image(path):
+    """Validate and decode one image and compute its handwriting features.
+
+    Runs in ingest worker processes. Returns (path, digest, info, error).
+    """
+    try:
+        from PIL import Image
+        from model import HandwritingFeatureExtractor, decode_image
+
+        with open(path, 'rb') as f:
+            image_bytes = f.read()
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            width, height = image.size
+            image.verify()  # cheap structural check before the full decode
+
+        gray, scale = decode_image(image_bytes, int(os.environ.get('MAX_IMAGE_SIDE', 2048)))
+        features = HandwritingFeatureExtractor().extract_features(gray, scale)
+        info = {'width': width, 'height': height, **features}
+        return path, hashlib.sha256(image_bytes).hexdigest(), info, None
+    except Exception as e:
+        return path, None, None, str(e)
+
+class BlobStore:
+    """Content-addressed image store: each distinct file is kept once, named by its SHA-256"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, blob):
+        return os.path.join(self.root, blob[:2], blob)
+
+    def put(self, source_path, digest=None):
+        """Store a file (if not already present) and return its blob name"""
+        blob = (digest or file_digest(source_path)) + os.path.splitext(source_path)[1].lower()
+        dest_path = self.path(blob)
+        if not os.path.exists(dest_path):
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            tmp_path = f'{dest_path}.{os.getpid()}.tmp'
+            shutil.copy2(source_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        return blob
+
+    def remove(self, blob):
+        try:
+            os.remove(self.path(blob))
+        except FileNotFoundError:
+            pass
+
+def link_or_copy(src, dst):
+    """Materialize src at dst without copying bytes where possible.
+
+    Tries a hardlink, then a symlink, then falls back to a copy. Hardlinked
+    exports share storage with the blob store and must be treated as
+    read-only.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.abspath(src), dst)
+        return 'symlink'
+    except OSError:
+        shutil.copy2(src, dst)
+        return 'copy'
+
+class DatasetCatalog:
+    """Indexed SQLite catalog of datasets and their images"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS datasets (
+      id TEXT PRIMARY KEY,
+      name TEXT NOT NULL,
+      behavior TEXT NOT NULL,
+      description TEXT,
+      image_count INTEGER NOT NULL DEFAULT 0,
+      created_at TIMESTAMP NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS images (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      dataset_id TEXT NOT NULL REFERENCES datasets(id) ON DELETE CASCADE,
+      filename TEXT NOT NULL,
+      blob TEXT,
+      added_at TIMESTAMP NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_images_dataset ON images(dataset_id, id);
+    CREATE INDEX IF NOT EXISTS idx_datasets_created_at ON datasets(created_at);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(self.SCHEMA)
+        # Catalogs created before the blob store lack the blob column
+        columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(images)')}
+        if 'blob' not in columns:
+            self.conn.execute('ALTER TABLE images ADD COLUMN blob TEXT')
+        for column in FEATURE_COLUMNS:
+            if column not in columns:
+                self.conn.execute(f'ALTER TABLE images ADD COLUMN {column} REAL')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_images_blob ON images(blob)')
+        self.conn.commit()
+
+    def create_dataset(self, dataset_id, name, behavior, description, created_at):
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO datasets (id, name, behavior, description, created_at) VALUES (?, ?, ?, ?, ?)',
+                (dataset_id, name, behavior, description, created_at)
+            )
+
+    def get_dataset(self, dataset_id):
+        row = self.conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        return dict(row) if row else None
+
+    def add_images(self, dataset_id, images):
+        """Insert (filename, blob) rows and bump the cached count: O(added), not O(dataset)"""
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO images (dataset_id, filename, blob, added_at) VALUES (?, ?, ?, ?)',
+                ((dataset_id, filename, blob, now) for filename, blob in images)
+            )
+            self.conn.execute('UPDATE datasets SET image_count = image_count + ? WHERE id = ?',
+                              (len(images), dataset_id))
+
+    def add_analyzed_images(self, dataset_id, rows):
+        """Insert image rows carrying precomputed dimensions and features"""
+        now = datetime.now().isoformat()
+        columns = ['dataset_id', 'filename', 'blob', 'added_at'] + FEATURE_COLUMNS
+        with self.conn:
+            self.conn.executemany(
+                f'INSERT INTO images ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                ([dataset_id, row['filename'], row['blob'], now] + [row.get(c) for c in FEATURE_COLUMNS]
+                 for row in rows)
+            )
+            self.conn.execute('UPDATE datasets SET image_count = image_count + ? WHERE id = ?',
+                              (len(rows), dataset_id))
+
+    def iter_features(self, dataset_id):
+        """Stored features per image, in insertion order"""
+        rows = self.conn.execute(
+            f'SELECT filename, blob, {", ".join(FEATURE_COLUMNS)} FROM images WHERE dataset_id = ? ORDER BY id',
+            (dataset_id,)
+        )
+        for row in rows:
+            yield dict(row)
+
+    def list_datasets(self, offset=0, limit=None):
+        rows = self.conn.execute(
+            'SELECT * FROM datasets ORDER BY created_at, id LIMIT ? OFFSET ?',
+            (-1 if limit is None else limit, offset)
+        )
+        return [dict(row) for row in rows]
+
+    def count_datasets(self):
+        return self.conn.execute('SELECT COUNT(*) FROM datasets').fetchone()[0]
+
+    def iter_images(self, dataset_id, offset=0, limit=None):
+        """Image filenames in insertion order, streamed from the index"""
+        rows = self.conn.execute(
+            'SELECT filename FROM images WHERE dataset_id = ? ORDER BY id LIMIT ? OFFSET ?',
+            (dataset_id, -1 if limit is None else limit, offset)
+        )
+        for (filename,) in rows:
+            yield filename
+
+    def iter_image_blobs(self, dataset_id):
+        """(filename, blob) pairs in insertion order; blob is None for pre-blob-store rows"""
+        rows = self.conn.execute(
+            'SELECT filename, blob FROM images WHERE dataset_id = ? ORDER BY id', (dataset_id,)
+        )
+        for filename, blob in rows:
+            yield filename, blob
+
+    def blob_references(self, blob):
+        return self.conn.execute('SELECT COUNT(*) FROM images WHERE blob = ?', (blob,)).fetchone()[0]
+
+    def delete_dataset(self, dataset_id):
+        with self.conn:
+            self.conn.execute('DELETE FROM images WHERE dataset_id = ?', (dataset_id,))
+            return self.conn.execute('DELETE FROM datasets WHERE id = ?', (dataset_id,)).rowcount > 0
+
 class DatasetManager:
     """Manage handwriting behavior datasets"""
-    
+
     def __init__(self, base_dir='datasets'):
         self.base_dir = base_dir
         self.ensure_directories()
-    
+        self.catalog = DatasetCatalog(os.path.join(self.base_dir, 'catalog.sqlite'))
+        self.blobs = BlobStore(os.path.join(self.base_dir, 'blobs'))
+        self.migrate_metadata()
+
     def ensure_directories(self):
         """Create necessary directories"""
         behaviors = ['Calm', 'Stressed', 'Angry', 'Focused', 'Happy']
         for behavior in behaviors:
             os.makedirs(os.path.join(self.base_dir, behavior), exist_ok=True)
         os.makedirs(os.path.join(self.base_dir, 'metadata'), exist_ok=True)
-    
+
+    def migrate_metadata(self):
+        """Import legacy per-dataset metadata JSON files into the catalog.
+
+        Each file is renamed to *.json.migrated once imported, so the
+        migration runs once and can be resumed if interrupted.
+        """
+        metadata_dir = os.path.join(self.base_dir, 'metadata')
+        migrated = 0
+        for file in sorted(os.listdir(metadata_dir)):
+            if not file.endswith('.json'):
+                continue
+            path = os.path.join(metadata_dir, file)
+            with open(path, 'r') as f:
+                metadata = json.load(f)
+            if self.catalog.get_dataset(metadata['id']) is None:
+                self.catalog.create_dataset(metadata['id'], metadata['name'], metadata['behavior'],
+                                            metadata.get('description', ''), metadata.get('created_at', metadata['id']))
+                # Legacy images stay in datasets/<behavior>/ (no blob)
+                self.catalog.add_images(metadata['id'], [(image, None) for image in metadata.get('images', [])])
+            os.replace(path, f'{path}.migrated')
+            migrated += 1
+        if migrated:
+            print(f'Migrated {migrated} dataset metadata files into the catalog')
+        return migrated
+
     def create_dataset(self, name: str, behavior: str, description: str = ''):
         """Create a new dataset"""
         dataset_id = datetime.now().isoformat()
-        metadata = {
-            'id': dataset_id,
-            'name': name,
-            'behavior': behavior,
-            'description': description,
-            'created_at': dataset_id,
-            'image_count': 0,
-            'images': []
-        }
-        
-        metadata_path = os.path.join(self.base_dir, 'metadata', f'{dataset_id}.json')
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-        
+        self.catalog.create_dataset(dataset_id, name, behavior, description, dataset_id)
         return dataset_id
-    
+
+    def get_dataset(self, dataset_id: str):
+        """Dataset metadata, or None if it does not exist"""
+        return self.catalog.get_dataset(dataset_id)
+
     def add_images(self, dataset_id: str, image_paths: list):
-        """Add images to a dataset"""
-        metadata_path = os.path.join(self.base_dir, 'metadata', f'{dataset_id}.json')
-        
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
-        
-        behavior = metadata['behavior']
-        behavior_dir = os.path.join(self.base_dir, behavior)
-        
-        added_images = []
+        """Add images to a dataset.
+
+        Files go into the content-addressed blob store, so identical images
+        are stored once and different files sharing a name never collide.
+        """
+        if self.catalog.get_dataset(dataset_id) is None:
+            raise KeyError(f'Unknown dataset: {dataset_id}')
+
+        added = []
         for image_path in image_paths:
             if os.path.exists(image_path):
-                filename = os.path.basename(image_path)
-                dest_path = os.path.join(behavior_dir, filename)
-                shutil.copy2(image_path, dest_path)
-                added_images.append(filename)
-        
-        metadata['images'].extend(added_images)
-        metadata['image_count'] = len(metadata['images'])
-        
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-        
-        return added_images
-    
+                added.append((os.path.basename(image_path), self.blobs.put(image_path)))
+
+        self.catalog.add_images(dataset_id, added)
+        return [filename for filename, _ in added]
+
+    def bulk_ingest(self, dataset_id: str, folder: str, workers: int = None, batch_size: int = 500):
+        """Ingest every image under `folder` with a pool of worker processes.
+
+        Workers validate and decode each file and compute its dimensions and
+        the five handwriting features, which are stored in the catalog so
+        training and analysis can use them without decoding again. Files
+        that fail validation are skipped and reported.
+        """
+        if self.catalog.get_dataset(dataset_id) is None:
+            raise KeyError(f'Unknown dataset: {dataset_id}')
+
+        paths = sorted(str(p) for p in Path(folder).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+        workers = workers or os.cpu_count() or 1
+        rows = []
+        failed = []
+        ingested = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, min(64, len(paths) // (workers * 4)))
+            for path, digest, info, error in pool.map(analyze_image, paths, chunksize=chunksize):
+                if error is not None:
+                    failed.append({'path': path, 'error': error})
+                    continue
+                rows.append({'filename': os.path.basename(path), 'blob': self.blobs.put(path, digest), **info})
+                if len(rows) >= batch_size:
+                    self.catalog.add_analyzed_images(dataset_id, rows)
+                    ingested += len(rows)
+                    rows = []
+
+        if rows:
+            self.catalog.add_analyzed_images(dataset_id, rows)
+            ingested += len(rows)
+
+        return {'ingested': ingested, 'failed': failed}
+
+    def get_features(self, dataset_id: str):
+        """Precomputed features for a dataset's images (None where not ingested in bulk)"""
+        return list(self.catalog.iter_features(dataset_id))
+
+    def image_path(self, behavior: str, filename: str, blob: str = None):
+        """Where an image's bytes live: its blob, or the legacy behavior folder"""
+        return self.blobs.path(blob) if blob else os.path.join(self.base_dir, behavior, filename)
+
+    def list_images(self, dataset_id: str, offset: int = 0, limit: int = None):
+        """Page through a dataset's image filenames"""
+        return list(self.catalog.iter_images(dataset_id, offset, limit))
+
     def export_dataset(self, dataset_id: str, export_dir='exports'):
         """Export dataset with labels file"""
         os.makedirs(export_dir, exist_ok=True)
-        
-        metadata_path = os.path.join(self.base_dir, 'metadata', f'{dataset_id}.json')
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
-        
+
+        metadata = self.catalog.get_dataset(dataset_id)
+        if metadata is None:
+            raise KeyError(f'Unknown dataset: {dataset_id}')
+
         behavior = metadata['behavior']
         behavior_index = {'Calm': 0, 'Stressed': 1, 'Angry': 2, 'Focused': 3, 'Happy': 4}
-        
+
+        # Names must be unique inside the export even if sources shared a basename
+        exported = []
+        used = set()
+        for filename, blob in self.catalog.iter_image_blobs(dataset_id):
+            stem, ext = os.path.splitext(filename)
+            name, n = filename, 1
+            while name in used:
+                name = f'{stem}_{n}{ext}'
+                n += 1
+            used.add(name)
+            exported.append((name, self.image_path(behavior, filename, blob)))
+
         # Create labels file
         labels_file = os.path.join(export_dir, f'{metadata["name"]}_labels.csv')
         with open(labels_file, 'w') as f:
-            for image in metadata['images']:
-                f.write(f'{image},{behavior_index[behavior]}\n')
-        
-        # Copy images
+            for name, _ in exported:
+                f.write(f'{name},{behavior_index[behavior]}\n')
+
+        # Precomputed features travel with the export for training and analysis
+        features_file = None
+        features = [row for row in self.catalog.iter_features(dataset_id) if row['slant_angle'] is not None]
+        if features:
+            features_file = os.path.join(export_dir, f'{metadata["name"]}_features.csv')
+            with open(features_file, 'w') as f:
+                f.write(','.join(['filename', 'label'] + FEATURE_COLUMNS) + '\n')
+                names = {}
+                for name, src in exported:
+                    names.setdefault(src, []).append(name)
+                for row in features:
+                    name = names[self.image_path(behavior, row['filename'], row['blob'])].pop(0)
+                    values = [str(row[c]) for c in FEATURE_COLUMNS]
+                    f.write(','.join([name, str(behavior_index[behavior])] + values) + '\n')
+
+        # Link images instead of copying bytes
         dataset_export_dir = os.path.join(export_dir, metadata['name'])
         os.makedirs(dataset_export_dir, exist_ok=True)
-        
-        source_dir = os.path.join(self.base_dir, behavior)
-        for image in metadata['images']:
-            src = os.path.join(source_dir, image)
-            dst = os.path.join(dataset_export_dir, image)
+
+        methods = {}
+        for name, src in exported:
             if os.path.exists(src):
-                shutil.copy2(src, dst)
-        
+                method = link_or_copy(src, os.path.join(dataset_export_dir, name))
+                methods[method] = methods.get(method, 0) + 1
+
         return {
             'export_dir': dataset_export_dir,
             'labels_file': labels_file,
-            'image_count': len(metadata['images'])
+            'features_file': features_file,
+            'image_count': len(exported),
+            'link_methods': methods
         }
-    
-    def list_datasets(self):
-        """List all datasets"""
-        metadata_dir = os.path.join(self.base_dir, 'metadata')
-        datasets = []
-        
-        for file in os.listdir(metadata_dir):
-            if file.endswith('.json'):
-                with open(os.path.join(metadata_dir, file), 'r') as f:
-                    datasets.append(json.load(f))
-        
-        return datasets
-    
+
+    def list_datasets(self, offset: int = 0, limit: int = None):
+        """List datasets (metadata only; use list_images for their images)"""
+        return self.catalog.list_datasets(offset, limit)
+
+    def count_datasets(self):
+        return self.catalog.count_datasets()
+
     def delete_dataset(self, dataset_id: str):
         """Delete a dataset"""
-        metadata_path = os.path.join(self.base_dir, 'metadata', f'{dataset_id}.json')
-        
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-            
-            # Delete images
+        metadata = self.catalog.get_dataset(dataset_id)
+
+        if metadata is not None:
+            images = list(self.catalog.iter_image_blobs(dataset_id))
+            self.catalog.delete_dataset(dataset_id)
+
+            # Delete images no other dataset references
             behavior = metadata['behavior']
-            behavior_dir = os.path.join(self.base_dir, behavior)
-            for image in metadata['images']:
-                image_path = os.path.join(behavior_dir, image)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-            
-            # Delete metadata
-            os.remove(metadata_path)
+            for filename, blob in images:
+                if blob:
+                    if self.catalog.blob_references(blob) == 0:
+                        self.blobs.remove(blob)
+                else:
+                    image_path = os.path.join(self.base_dir, behavior, filename)
+                    if os.path.exists(image_path):
+                        os.remove(image_path)
             return True
         return False
 
 # Usage example
 if __name__ == '__main__':
-    manager = DatasetManager()
-    
-    # Create dataset
-    dataset_id = manager.create_dataset('Test Calm Dataset', 'Calm', 'Sample calm handwriting')
-    
-    # Add images (you would provide actual image paths)
-    # manager.add_images(dataset_id, ['path/to/image1.jpg', 'path/to/image2.jpg'])
-    
-    # List datasets
-    datasets = manager.list_datasets()
-    print(f'Total datasets: {len(datasets)}')
-    
-    # Export dataset
-    # export_info = manager.export_dataset(dataset_id)
-    # print(f'Exported to: {export_info["export_dir"]}')
+    parser = argparse.ArgumentParser(description='Manage handwriting behavior datasets')
+    parser.add_argument('--base-dir', default='datasets')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('list', help='list datasets')
+    ingest = commands.add_parser('ingest', help='bulk-ingest a folder with precomputed features')
+    ingest.add_argument('folder')
+    ingest.add_argument('--dataset-id', help='existing dataset (default: create one)')
+    ingest.add_argument('--name', help='name for a new dataset')
+    ingest.add_argument('--behavior', choices=['Calm', 'Stressed', 'Angry', 'Focused', 'Happy'])
+    ingest.add_argument('--workers', type=int, default=None)
+    export = commands.add_parser('export', help='export a dataset with labels and features')
+    export.add_argument('dataset_id')
+    export.add_argument('--export-dir', default='exports')
+    args = parser.parse_args()
+
+    manager = DatasetManager(base_dir=args.base_dir)
+
+    if args.command == 'ingest':
+        dataset_id = args.dataset_id
+        if dataset_id is None:
+            if not args.behavior:
+                parser.error('--behavior is required when creating a dataset')
+            dataset_id = manager.create_dataset(args.name or os.path.basename(os.path.normpath(args.folder)),
+                                                args.behavior)
+        result = manager.bulk_ingest(dataset_id, args.folder, workers=args.workers)
+        print(f"Ingested {result['ingested']} images into {dataset_id}, {len(result['failed'])} failed")
+        for failure in result['failed']:
+            print(f"  {failure['path']}: {failure['error']}")
+    elif args.command == 'export':
+        export_info = manager.export_dataset(args.dataset_id, args.export_dir)
+        print(f'Exported to: {export_info["export_dir"]}')
+    else:
+        # List datasets
+        for dataset in manager.list_datasets():
+            print(f"{dataset['id']}  {dataset['name']} ({dataset['behavior']}): {dataset['image_count']} images")
+        print(f'Total datasets: {manager.count_datasets()}')
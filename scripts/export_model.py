@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import sys
+import time
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from torchvision import transforms
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from cnn import build_model, load_checkpoint, artifact_paths
+from train_model import HandwritingDataset
+
+def quantize(model):
+    """Dynamic INT8 quantization of the Linear layers (fc1/fc2/fc3)"""
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def trace(model, input_size, freeze=True):
+    """Trace to TorchScript; freezing folds weights and BatchNorm into the graph"""
+    with torch.inference_mode():
+        traced = torch.jit.trace(model, torch.zeros(1, 1, input_size, input_size)).eval()
+    return torch.jit.freeze(traced) if freeze else traced
+
+def latency(model, input_size, batch_size, runs=20):
+    """Median forward latency in milliseconds"""
+    x = torch.randn(batch_size, 1, input_size, input_size)
+    timings = []
+    with torch.inference_mode():
+        model(x)  # warm-up
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(x)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+def evaluation_batches(input_size, image_dir=None, labels_file=None, samples=256):
+    """Labelled batches from a dataset, or unlabelled random inputs when none is given"""
+    if image_dir and labels_file:
+        transform = transforms.Compose([
+            transforms.Grayscale(num_output_channels=1),
+            transforms.Resize((input_size, input_size)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.5], std=[0.5])
+        ])
+        dataset = HandwritingDataset(image_dir, labels_file, transform=transform, input_size=input_size)
+        if len(dataset) > 0:
+            return list(DataLoader(dataset, batch_size=64))
+    generator = torch.Generator().manual_seed(0)
+    return [(torch.randn(64, 1, input_size, input_size, generator=generator), None)
+            for _ in range(samples // 64)]
+
+def compare(reference, candidate, batches):
+    """Accuracy of both models (when labelled) and top-1 agreement with the reference"""
+    agree = correct_ref = correct_cand = total = 0
+    labelled = True
+    with torch.inference_mode():
+        for images, labels in batches:
+            ref = reference(images).argmax(1)
+            cand = candidate(images).argmax(1)
+            agree += ref.eq(cand).sum().item()
+            total += len(images)
+            if labels is None:
+                labelled = False
+            else:
+                correct_ref += ref.eq(labels).sum().item()
+                correct_cand += cand.eq(labels).sum().item()
+    result = {'agreement': 100.0 * agree / total}
+    if labelled:
+        result['accuracy'] = 100.0 * correct_cand / total
+        result['accuracy_delta'] = 100.0 * (correct_cand - correct_ref) / total
+    return result
+
+def export(checkpoint_path, image_dir=None, labels_file=None):
+    """Write TorchScript fp32 and dynamic-INT8 artifacts next to a checkpoint, plus a report"""
+    torch.set_num_threads(os.cpu_count() or 1)
+    arch, input_size, state_dict = load_checkpoint(checkpoint_path)
+    model = build_model(arch)
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    paths = artifact_paths(checkpoint_path)
+    meta = {'arch': arch, 'input_size': input_size}
+    extra_files = {'meta.json': json.dumps(meta)}
+
+    scripted = trace(model, input_size)
+    torch.jit.save(scripted, paths['torchscript'], _extra_files=extra_files)
+    quantized = trace(quantize(model), input_size, freeze=False)
+    torch.jit.save(quantized, paths['int8'], _extra_files=extra_files)
+
+    batches = evaluation_batches(input_size, image_dir, labels_file)
+    report = {'checkpoint': checkpoint_path, **meta, 'artifacts': {}}
+    candidates = (('eager', model, checkpoint_path),
+                  ('torchscript', scripted, paths['torchscript']),
+                  ('int8', quantized, paths['int8']))
+    for name, candidate, path in candidates:
+        report['artifacts'][name] = {
+            'path': path,
+            'size_mb': os.path.getsize(path) / 2**20,
+            'latency_ms': {b: latency(candidate, input_size, b) for b in (1, 16)},
+            **compare(model, candidate, batches)
+        }
+
+    with open(paths['report'], 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export optimized CPU inference artifacts from a checkpoint')
+    parser.add_argument('checkpoint', nargs='?', default='models/handwriting_model.pth')
+    parser.add_argument('--image-dir', help='labelled images for the accuracy delta')
+    parser.add_argument('--labels-file')
+    args = parser.parse_args()
+
+    report = export(args.checkpoint, args.image_dir, args.labels_file)
+    for name, info in report['artifacts'].items():
+        latency_text = ' '.join(f"b{b}={ms:.1f}ms" for b, ms in info['latency_ms'].items())
+        accuracy = f" accuracy={info['accuracy']:.2f}% (delta {info['accuracy_delta']:+.2f})" if 'accuracy' in info else ''
+        print(f"{name:>11}: {info['size_mb']:7.2f}MB {latency_text} agreement={info['agreement']:.1f}%{accuracy}")
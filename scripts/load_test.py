@@ -0,0 +1,107 @@
+import argparse
+import http.client
+import os
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+def multipart_body(image_bytes, filename):
+    """Encode a single 'file' field as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode() + image_bytes + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def run_level(url, images, concurrency, duration, salt=True):
+    """Closed-loop load: `concurrency` clients posting back to back for `duration` seconds.
+
+    With `salt`, every request appends unique bytes after the image, which
+    decoders ignore but which change its content hash, so no request is a
+    prediction-cache hit and every one goes through admission control.
+    """
+    target = urlparse(url)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(worker):
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        i = worker
+        while time.perf_counter() < deadline:
+            image_bytes, name = images[i % len(images)]
+            if salt:
+                image_bytes += uuid.uuid4().bytes
+            body, content_type = multipart_body(image_bytes, name)
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                conn.request('POST', target.path or '/predict', body=body, headers={'Content-Type': content_type})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+                status = 'conn_error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'ok': len(latencies),
+        'statuses': statuses,
+        'throughput': len(latencies) / wall,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000
+    }
+
+def load_images(paths, unique):
+    """(bytes, filename) of image files, or of synthetic pages when none are given"""
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append((f.read(), os.path.basename(path)))
+    if not images:
+        from synthetic_handwriting import render_page, encode
+        images = [(encode(render_page(1600, 1200, seed=i)), f'synthetic_{i}.jpg') for i in range(unique)]
+    return images
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test /predict: p50/p99 latency and throughput')
+    parser.add_argument('--url', default='http://127.0.0.1:5000/predict')
+    parser.add_argument('--images', nargs='*', default=[], help='image files to upload (default: synthetic)')
+    parser.add_argument('--unique', type=int, default=64, help='synthetic images to generate')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per concurrency level')
+    parser.add_argument('--cache-hits', action='store_true',
+                        help='resend identical bytes so repeats are served from the prediction cache')
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.unique)
+    print(f"{'clients':>8} {'ok':>7} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9}  statuses")
+    for level in args.concurrency:
+        r = run_level(args.url, images, level, args.duration, salt=not args.cache_hits)
+        print(f"{r['concurrency']:>8} {r['ok']:>7} {r['throughput']:>8.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}  {r['statuses']}")
@@ -0,0 +1,275 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tarfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+# Flat output columns; the full nested prediction is kept in JSONL only
+COLUMNS = ['key', 'behavior', 'confidence', 'slant_angle', 'avg_size', 'stroke', 'pressure', 'spacing',
+           'image_hash', 'error']
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+def iter_directory(root):
+    """(key, path) for every image under `root`, in a stable order; workers read the files"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if is_image(filename):
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, root), path
+
+def iter_tar(path, skip=()):
+    """(key, bytes) for every image in a tar archive, read sequentially in stream mode.
+
+    Members in `skip` are yielded with None instead of their bytes, so a
+    resumed run does not read data it will not score.
+    """
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and is_image(member.name):
+                yield member.name, None if member.name in skip else archive.extractfile(member).read()
+
+# Worker process state
+_model = None
+
+def _init_worker(mode, model_path):
+    global _model
+    from model import BehaviorDetectionModel
+    # Each worker scores one image at a time; parallelism comes from the pipeline
+    _model = BehaviorDetectionModel(model_path=model_path, batch_workers=1, prediction_mode=mode)
+
+def _score(key, source):
+    """Score one image from a path or its bytes, returning (key, prediction, pid, seconds)"""
+    start = time.perf_counter()
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                source = f.read()
+        prediction = _model.predict(source)
+    except Exception as e:
+        prediction = {'behavior': 'Unknown', 'confidence': 0.0, 'scores': {}, 'error': str(e)}
+    return key, prediction, os.getpid(), time.perf_counter() - start
+
+def truncate_partial_line(path):
+    """Cut a file back to just after its last newline, dropping a line a hard kill left half-written"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(65536, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b'\n')
+            position -= step
+            if newline >= 0:
+                position += newline + 1
+                break
+        if position < end:
+            f.truncate(position)
+
+class Manifest:
+    """Append-only list of finished keys; a key is added only after its result is flushed"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        truncate_partial_line(path)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.done.update(line.rstrip('\n') for line in f if line.strip())
+        self._file = open(path, 'a')
+
+    def add(self, keys):
+        self._file.writelines(key + '\n' for key in keys)
+        self._file.flush()
+        self.done.update(keys)
+
+    def close(self):
+        self._file.close()
+
+class JsonlWriter:
+    """Writers return the keys whose rows are on disk after each write"""
+
+    def __init__(self, path):
+        # A partial last line would otherwise run into the first new row
+        truncate_partial_line(path)
+        self._file = open(path, 'a')
+
+    def write(self, row):
+        self._file.write(json.dumps(row) + '\n')
+        self._file.flush()
+        return [row['key']]
+
+    def close(self):
+        self._file.close()
+        return []
+
+class CsvWriter:
+    def __init__(self, path):
+        truncate_partial_line(path)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS, extrasaction='ignore')
+        if new:
+            self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+        self._file.flush()
+        return [row['key']]
+
+    def close(self):
+        self._file.close()
+        return []
+
+class ParquetWriter:
+    """Buffers rows and writes each full row group as its own complete part file next to `path`.
+
+    A part file only appears (by rename) once its footer is written, so a
+    killed run leaves every finished group readable and loses only the
+    buffered rows, whose keys are not yet in the manifest.
+    """
+
+    def __init__(self, path, row_group_size=1000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit('Parquet output requires pyarrow (pip install pyarrow)')
+        self._pa = pa
+        self._pq = pq
+        self._stem = path[:-len('.parquet')] if path.endswith('.parquet') else path
+        self._part = 0
+        self._schema = pa.schema([(c, pa.float64() if c in ('confidence', 'slant_angle', 'avg_size', 'stroke',
+                                                            'pressure', 'spacing') else pa.string())
+                                  for c in COLUMNS])
+        self._rows = []
+        self.row_group_size = row_group_size
+
+    def _next_path(self):
+        while os.path.exists(f'{self._stem}.part-{self._part:04d}.parquet'):
+            self._part += 1
+        return f'{self._stem}.part-{self._part:04d}.parquet'
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            return self.flush()
+        return []
+
+    def flush(self):
+        if not self._rows:
+            return []
+        columns = {c: [row.get(c) for row in self._rows] for c in COLUMNS}
+        path = self._next_path()
+        tmp_path = f'{path}.tmp'
+        self._pq.write_table(self._pa.Table.from_pydict(columns, schema=self._schema), tmp_path)
+        os.replace(tmp_path, path)
+        keys = [row['key'] for row in self._rows]
+        self._rows = []
+        return keys
+
+    def close(self):
+        return self.flush()
+
+WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter, 'parquet': ParquetWriter}
+
+def output_format(path, requested=None):
+    if requested:
+        return requested
+    for fmt in WRITERS:
+        if path.endswith('.' + fmt):
+            return fmt
+    return 'jsonl'
+
+def flat_row(key, prediction):
+    row = {'key': key}
+    row.update({c: prediction.get(c) for c in COLUMNS[1:]})
+    return row
+
+def score(source, output, fmt=None, mode=None, workers=None, max_pending=None, manifest_path=None,
+          progress_every=10.0, model_path=None):
+    """Score every image in a directory tree or tar archive, resuming from the manifest"""
+    from model import default_model_path
+    mode = mode or os.environ.get('PREDICTION_MODE', 'rules')
+    model_path = model_path or default_model_path()
+    if mode == 'cnn' and not (model_path and os.path.exists(model_path)):
+        raise SystemExit('CNN scoring needs trained weights: pass --model-path or set MODEL_PATH')
+    fmt = output_format(output, fmt)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    manifest = Manifest(manifest_path or output + '.manifest')
+    writer = WRITERS[fmt](output)
+    items = iter_tar(source, manifest.done) if os.path.isfile(source) else iter_directory(source)
+
+    per_worker = {}
+    scored = skipped = errors = 0
+    started = last_report = time.perf_counter()
+
+    def report(final=False):
+        elapsed = time.perf_counter() - started
+        print(f"{'Done' if final else 'Progress'}: {scored} scored ({errors} errors), {skipped} skipped, "
+              f"{scored / elapsed if elapsed else 0:.1f} images/sec overall")
+        for index, (pid, (count, busy)) in enumerate(sorted(per_worker.items())):
+            print(f"  worker {index} (pid {pid}): {count} images, {count / busy if busy else 0:.1f} images/sec")
+
+    def collect(done):
+        nonlocal scored, errors
+        for future in done:
+            key, prediction, pid, seconds = future.result()
+            row = dict(prediction, key=key) if fmt == 'jsonl' else flat_row(key, prediction)
+            manifest.add(writer.write(row))
+            count, busy = per_worker.get(pid, (0, 0.0))
+            per_worker[pid] = (count + 1, busy + seconds)
+            scored += 1
+            errors += 'error' in prediction
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mode, model_path)) as pool:
+            pending = set()
+            for key, item in items:
+                if key in manifest.done:
+                    skipped += 1
+                    continue
+                # Bounded in-flight work keeps tar bytes from piling up in memory
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(pool.submit(_score, key, item))
+
+                if time.perf_counter() - last_report >= progress_every:
+                    report()
+                    last_report = time.perf_counter()
+            collect(wait(pending).done)
+    finally:
+        manifest.add(writer.close())
+        manifest.close()
+    report(final=True)
+    return scored, skipped, errors
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a directory tree or tar archive of scans offline')
+    parser.add_argument('source', help='directory of images, or a .tar/.tar.gz archive')
+    parser.add_argument('output', help='results file (.jsonl, .csv or .parquet)')
+    parser.add_argument('--format', choices=list(WRITERS), help='output format (default: from extension)')
+    parser.add_argument('--mode', choices=['rules', 'cnn'], help='prediction mode (default: PREDICTION_MODE)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: cpu count)')
+    parser.add_argument('--max-pending', type=int, help='images in flight (default: 4 per worker)')
+    parser.add_argument('--model-path', help='trained CNN checkpoint for --mode cnn (default: MODEL_PATH or '
+                                             'models/handwriting_model.pth)')
+    parser.add_argument('--manifest', help='progress manifest (default: <output>.manifest)')
+    parser.add_argument('--progress-every', type=float, default=10.0, help='seconds between progress reports')
+    args = parser.parse_args()
+
+    score(args.source, args.output, args.format, args.mode, args.workers, args.max_pending, args.manifest,
+          args.progress_every, args.model_path)
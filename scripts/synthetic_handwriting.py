@@ -0,0 +1,49 @@
+import io
+import numpy as np
+import cv2
+from PIL import Image
+
+def render_page(width=1024, height=768, seed=0, slant=0.0, density=1.0, style='zigzag'):
+    """Render a deterministic page of pen-stroke 'words' on paper.
+
+    `slant` leans strokes by that many degrees (positive leans right) and
+    `density` scales ink coverage: thicker strokes and tighter word gaps.
+    style='cursive' draws letters as near-vertical downstrokes joined by
+    upstrokes, so the page has a well-defined slant to measure; the
+    default zig-zag strokes reproduce the original pages exactly.
+    """
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width), 245, dtype=np.uint8)
+    line_height = max(24, height // 12)
+    letter = max(6, line_height // 2)
+    thickness = max(1, int(letter // 8 * density))
+    shear = np.tan(np.radians(slant))
+
+    for baseline in range(line_height, height - letter, line_height):
+        x = int(rng.integers(letter, 3 * letter))
+        while x < width - 2 * letter:
+            # One word: a polyline zig-zagging between baseline and x-height
+            n = int(rng.integers(3, 9))
+            if style == 'cursive':
+                # Top and bottom of each downstroke, stepping right between letters
+                tops = x + np.cumsum(rng.integers(letter // 2, letter, size=n))
+                bottoms = tops + rng.integers(-(letter // 10), letter // 10 + 1, size=n)
+                heights = rng.integers(4 * letter // 5, letter + 1, size=n)
+                xs = np.stack([tops, bottoms], axis=1).ravel()
+                ys = np.stack([baseline - heights, np.full(n, baseline)], axis=1).ravel()
+            else:
+                xs = x + np.cumsum(rng.integers(letter // 3, letter, size=n))
+                ys = baseline - rng.integers(0, letter, size=n)
+            # Shear about the baseline: x' = x + (baseline - y) * tan(slant)
+            sheared = xs + np.round((baseline - ys) * shear).astype(xs.dtype)
+            pts = np.stack([sheared, ys], axis=1).astype(np.int32)
+            cv2.polylines(page, [pts], False, int(rng.integers(10, 80)), thickness, cv2.LINE_AA)
+            x = int(xs[-1]) + int(int(rng.integers(letter, 2 * letter)) / density)
+
+    return page
+
+def encode(image, fmt='JPEG', quality=90):
+    """Encode a grayscale array as image file bytes"""
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format=fmt, **({'quality': quality} if fmt == 'JPEG' else {}))
+    return buffer.getvalue()
@@ -0,0 +1,180 @@
+import argparse
+import os
+import socket
+import time
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import TensorDataset
+from torch.utils.data.distributed import DistributedSampler
+
+from train_model import batch_augment, build_dataloader, build_dataset
+from training_cache import ensure_cache
+from cnn import ARCHITECTURES, build_model, default_input_size, save_checkpoint
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def synthetic_dataset(count, input_size):
+    """Random tensors for measuring compute scaling without decode cost"""
+    generator = torch.Generator().manual_seed(0)
+    images = torch.randn(count, 1, input_size, input_size, generator=generator)
+    labels = torch.randint(0, 5, (count,), generator=generator)
+    return TensorDataset(images, labels)
+
+def run_worker(rank, world_size, config, results=None):
+    """One data-parallel training process (CPU, gloo backend)"""
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+    # Split the cores between processes so they do not oversubscribe
+    torch.set_num_threads(max(1, config['threads'] // world_size))
+    torch.manual_seed(config['seed'])
+
+    input_size = config['input_size']
+    if config['synthetic']:
+        dataset = synthetic_dataset(config['synthetic'], input_size)
+    else:
+        if config['cache_dir'] and os.path.exists(config['labels_file']):
+            # One rank builds the cache; the others would race on its temporary directory
+            if rank == 0:
+                ensure_cache(config['image_dir'], config['labels_file'], config['cache_dir'], input_size)
+            dist.barrier()
+        dataset = build_dataset(config['image_dir'], config['labels_file'], input_size,
+                                config['cache_dir'], config['pipeline'], build_cache=False)
+    if len(dataset) == 0:
+        if rank == 0:
+            print("No training data found. Please provide training images and labels file.")
+        dist.destroy_process_group()
+        return
+
+    sampler = DistributedSampler(dataset, num_replicas=world_size, rank=rank, shuffle=True, seed=config['seed'])
+    dataloader = build_dataloader(dataset, config['batch_size'], config['num_workers'], sampler=sampler)
+
+    # DDP all-reduces gradients across processes during backward
+    model = DistributedDataParallel(build_model(config['arch']))
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=5, gamma=0.1)
+
+    if rank == 0:
+        print(f"Starting distributed training: {world_size} processes, {len(dataset)} images")
+
+    dist.barrier()
+    images_total = 0
+    start = time.perf_counter()
+    for epoch in range(config['epochs']):
+        sampler.set_epoch(epoch)
+        model.train()
+        totals = torch.zeros(3, dtype=torch.float64)  # loss sum, correct, seen
+
+        for batch_idx, (images, labels) in enumerate(dataloader):
+            if config['max_batches'] and batch_idx >= config['max_batches']:
+                break
+            if config['pipeline'] == 'batched' and not config['synthetic']:
+                images = batch_augment(images)
+
+            optimizer.zero_grad()
+            outputs = model(images)
+            loss = criterion(outputs, labels)
+            loss.backward()
+            optimizer.step()
+
+            totals += torch.tensor([loss.item() * labels.size(0),
+                                    outputs.argmax(1).eq(labels).sum().item(),
+                                    labels.size(0)], dtype=torch.float64)
+
+        scheduler.step()
+        dist.all_reduce(totals)
+        images_total += totals[2].item()
+        if rank == 0:
+            print(f"Epoch {epoch+1}/{config['epochs']} - Loss: {totals[0] / totals[2]:.4f}, "
+                  f"Accuracy: {100. * totals[1] / totals[2]:.2f}%")
+
+    dist.barrier()
+    elapsed = time.perf_counter() - start
+
+    if rank == 0:
+        throughput = images_total / elapsed
+        print(f"Throughput: {throughput:.1f} images/sec across {world_size} processes")
+        if results is not None:
+            results.put((world_size, throughput))
+        if config['model_save_path']:
+            # Weights are identical on every rank; only rank 0 writes them
+            save_path = config['model_save_path']
+            os.makedirs(os.path.dirname(save_path) or '.', exist_ok=True)
+            save_checkpoint(model.module, save_path, config['arch'], input_size)
+            print(f"Model saved to {save_path}")
+
+    dist.destroy_process_group()
+
+def launch(world_size, config, results=None):
+    """Spawn `world_size` local processes, or join an external launcher (torchrun)"""
+    if 'RANK' in os.environ and 'WORLD_SIZE' in os.environ:
+        run_worker(int(os.environ['RANK']), int(os.environ['WORLD_SIZE']), config, results)
+        return
+    os.environ.setdefault('MASTER_ADDR', '127.0.0.1')
+    os.environ['MASTER_PORT'] = str(free_port())
+    mp.spawn(run_worker, args=(world_size, config, results), nprocs=world_size, join=True)
+
+def scaling_report(process_counts, config):
+    """Throughput at several process counts, with speedup and efficiency"""
+    results = mp.get_context('spawn').SimpleQueue()
+    config = dict(config, model_save_path=None)
+    rates = {}
+    for world_size in process_counts:
+        launch(world_size, config, results)
+        count, rate = results.get()
+        rates[count] = rate
+    base = rates[process_counts[0]] / process_counts[0]
+    print("\nprocesses  images/sec  speedup  efficiency")
+    for count, rate in rates.items():
+        speedup = rate / rates[process_counts[0]]
+        print(f"{count:>9}  {rate:10.1f}  {speedup:7.2f}x  {100 * rate / (base * count):9.1f}%")
+    return rates
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multi-process CPU data-parallel training (gloo)')
+    parser.add_argument('--nproc', type=int, default=2, help='local processes to spawn')
+    parser.add_argument('--image-dir', default='datasets/training_images')
+    parser.add_argument('--labels-file', default='datasets/labels.csv')
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--pipeline', choices=['per_image', 'batched'], default='per_image')
+    parser.add_argument('--arch', choices=list(ARCHITECTURES), default='baseline')
+    parser.add_argument('--input-size', type=int, default=None)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32, help='per-process batch size')
+    parser.add_argument('--num-workers', type=int, default=0, help='DataLoader workers per process')
+    parser.add_argument('--max-batches', type=int, default=0, help='limit batches per epoch (0 = all)')
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1, help='total compute threads')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--synthetic', type=int, default=0, help='train on N random tensors instead of images')
+    parser.add_argument('--model-save-path', default='models/handwriting_model.pth')
+    parser.add_argument('--scaling', type=int, nargs='+', help='report throughput for these process counts')
+    args = parser.parse_args()
+
+    input_size = default_input_size(args.arch) if args.arch == 'baseline' or not args.input_size else args.input_size
+    config = {
+        'image_dir': args.image_dir,
+        'labels_file': args.labels_file,
+        'cache_dir': args.cache_dir,
+        'pipeline': args.pipeline,
+        'arch': args.arch,
+        'input_size': input_size,
+        'epochs': args.epochs,
+        'batch_size': args.batch_size,
+        'num_workers': args.num_workers,
+        'max_batches': args.max_batches,
+        'threads': args.threads,
+        'seed': args.seed,
+        'synthetic': args.synthetic,
+        'model_save_path': args.model_save_path,
+    }
+
+    if args.scaling:
+        scaling_report(args.scaling, config)
+    else:
+        launch(args.nproc, config)
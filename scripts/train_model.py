@@ -1,9 +1,12 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
-from torch.utils.data import DataLoader, Dataset
+from torch.utils.data import DataLoader, Dataset, Sampler, Subset
 from torchvision import transforms
+import argparse
 import os
+import random
 from PIL import Image
 import numpy as np
 import sys
@@ -11,14 +14,16 @@ import sys
 # Add parent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from model import HandwritingBehaviorCNN
+from cnn import ARCHITECTURES, build_model, default_input_size, save_checkpoint
+from training_cache import CachedHandwritingDataset, ensure_cache, source_fingerprint
 
 class HandwritingDataset(Dataset):
     """Custom dataset for handwriting behavior classification"""
     
-    def __init__(self, image_dir, labels_file, transform=None):
+    def __init__(self, image_dir, labels_file, transform=None, input_size=224):
         self.image_dir = image_dir
         self.transform = transform
+        self.input_size = input_size
         self.image_files = []
         self.labels = []
         
@@ -47,27 +52,185 @@ class HandwritingDataset(Dataset):
             return image, label
         except Exception as e:
             print(f"Error loading image {img_path}: {e}")
-            return torch.zeros((1, 224, 224)), torch.tensor(0, dtype=torch.long)
+            return torch.zeros((1, self.input_size, self.input_size)), torch.tensor(0, dtype=torch.long)
 
-def train_model(image_dir, labels_file, epochs=10, batch_size=32, model_save_path='models/handwriting_model.pth'):
-    """Train the handwriting behavior detection model"""
+def batch_augment(images, degrees=10, translate=(0.1, 0.1)):
+    """Random rotation + translation of a whole (N, 1, H, W) batch in one pass.
+
+    Equivalent to RandomRotation(degrees) followed by
+    RandomAffine(translate=translate) per image, but built from one batched
+    affine grid and a single grid_sample call. Areas moved in from outside
+    the image are filled with 0 before normalization (-1 after), like the
+    per-image transforms.
+    """
+    n = images.size(0)
+    angles = (torch.rand(n, device=images.device) * 2 - 1) * degrees * np.pi / 180
+    # Normalized coordinates span 2 units, so a fraction t of the size is 2t
+    shifts = (torch.rand(n, 2, device=images.device) * 2 - 1) * torch.tensor(translate, device=images.device) * 2
+    cos, sin = torch.cos(angles), torch.sin(angles)
+    theta = torch.stack([
+        torch.stack([cos, -sin, shifts[:, 0]], dim=1),
+        torch.stack([sin, cos, shifts[:, 1]], dim=1)
+    ], dim=1)
+    grid = F.affine_grid(theta, images.shape, align_corners=False)
+    return F.grid_sample(images + 1, grid, mode='bilinear', padding_mode='zeros', align_corners=False) - 1
+
+def build_dataset(image_dir, labels_file, input_size=224, cache_dir=None, pipeline='per_image', build_cache=True):
+    """Training dataset for the chosen input pipeline.
+
+    'per_image' applies the random augmentations to each sample in the
+    dataset; 'batched' leaves them to batch_augment in the training loop;
+    'eval' builds the same dataset without augmentation. With
+    `build_cache=False` an existing cache is opened as is.
+    """
+    augment = pipeline == 'per_image'
+    if cache_dir and os.path.exists(labels_file):
+        # Decode/resize once into memory-mapped shards; only augment per epoch
+        if build_cache:
+            ensure_cache(image_dir, labels_file, cache_dir, input_size)
+        transform = transforms.Compose([
+            transforms.RandomRotation(10),
+            transforms.RandomAffine(degrees=0, translate=(0.1, 0.1))
+        ]) if augment else None
+        return CachedHandwritingDataset(cache_dir, transform=transform)
+
+    steps = [
+        transforms.Grayscale(num_output_channels=1),
+        transforms.Resize((input_size, input_size))
+    ]
+    if augment:
+        steps += [
+            transforms.RandomRotation(10),
+            transforms.RandomAffine(degrees=0, translate=(0.1, 0.1))
+        ]
+    steps += [
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.5], std=[0.5])
+    ]
+    return HandwritingDataset(image_dir, labels_file, transform=transforms.Compose(steps), input_size=input_size)
+
+def seed_worker(worker_id):
+    """Seed numpy and random in a DataLoader worker from its torch seed (base seed + worker id)"""
+    worker_seed = torch.initial_seed() % 2**32
+    np.random.seed(worker_seed)
+    random.seed(worker_seed)
+
+def build_dataloader(dataset, batch_size=32, num_workers=0, prefetch_factor=2, shuffle=True, sampler=None,
+                     seed=None, persistent_workers=True):
+    """DataLoader with worker, prefetch and pinning settings for the input pipeline.
+
+    With `seed`, worker seeds come from a generator seeded with it rather
+    than from the global RNG, so a loader rebuilt with the same seed
+    repeats its workers' random augmentations.
+    """
+    options = {}
+    if num_workers > 0:
+        options.update(persistent_workers=persistent_workers, prefetch_factor=prefetch_factor)
+    if seed is not None:
+        options.update(generator=torch.Generator().manual_seed(seed), worker_init_fn=seed_worker)
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=shuffle and sampler is None,
+        sampler=sampler,
+        num_workers=num_workers,
+        pin_memory=torch.cuda.is_available(),
+        **options
+    )
+
+class ResumableRandomSampler(Sampler):
+    """Shuffling sampler whose order is a function of (seed, epoch).
+
+    Because each epoch's permutation can be regenerated, a run resumed
+    mid-epoch skips the batches already trained on instead of reshuffling.
+    """
+
+    def __init__(self, indices, seed=0):
+        self.indices = list(indices)
+        self.seed = seed
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch = epoch
+        self.start = start
+
+    def __iter__(self):
+        generator = torch.Generator().manual_seed(self.seed + self.epoch)
+        order = torch.randperm(len(self.indices), generator=generator).tolist()
+        return iter([self.indices[i] for i in order[self.start:]])
+
+    def __len__(self):
+        return len(self.indices) - self.start
+
+def split_indices(count, val_split, seed=0):
+    """Deterministic train/validation split of dataset indices"""
+    order = torch.randperm(count, generator=torch.Generator().manual_seed(seed)).tolist()
+    val_count = int(count * val_split)
+    return order[val_count:], order[:val_count]
+
+def rng_state():
+    state = {'torch': torch.get_rng_state(), 'numpy': np.random.get_state(), 'python': random.getstate()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state):
+    torch.set_rng_state(state['torch'])
+    np.random.set_state(state['numpy'])
+    random.setstate(state['python'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+def save_training_state(path, state):
+    """Write a resumable training checkpoint atomically"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+def evaluate(model, dataloader, criterion, device):
+    """Average loss and accuracy over a held-out split"""
+    model.eval()
+    total_loss = 0.0
+    correct = 0
+    total = 0
+    with torch.no_grad():
+        for images, labels in dataloader:
+            images, labels = images.to(device), labels.to(device)
+            outputs = model(images)
+            total_loss += criterion(outputs, labels).item() * labels.size(0)
+            correct += outputs.argmax(1).eq(labels).sum().item()
+            total += labels.size(0)
+    return total_loss / total, 100. * correct / total
+
+def train_model(image_dir, labels_file, epochs=10, batch_size=32, model_save_path='models/handwriting_model.pth',
+                arch='baseline', input_size=None, cache_dir=None, pipeline='per_image', num_workers=0,
+                prefetch_factor=2, checkpoint_dir=None, checkpoint_every=0, resume=True, val_split=0.0,
+                patience=0, seed=0):
+    """Train the handwriting behavior detection model.
+
+    With `checkpoint_dir`, model, optimizer, scheduler, RNG state and the
+    epoch/batch position are saved to last.pt at the end of every epoch
+    (and every `checkpoint_every` batches), and an interrupted run resumes
+    where it stopped. DataLoader worker seeds are a function of (seed,
+    epoch), so resuming at an epoch boundary repeats the uninterrupted
+    run's augmentations; resuming mid-epoch with workers does not, since
+    the workers' random streams restart. With `val_split`, that fraction
+    is held out; the best model by validation loss is saved, and training
+    stops after `patience` epochs without improvement.
+    """
+    # Only architectures with global pooling accept a non-native input size
+    if arch == 'baseline' or not input_size:
+        input_size = default_input_size(arch)
     
     # Check if CUDA is available
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
-    
-    # Data transforms
-    transform = transforms.Compose([
-        transforms.Grayscale(num_output_channels=1),
-        transforms.Resize((224, 224)),
-        transforms.RandomRotation(10),
-        transforms.RandomAffine(degrees=0, translate=(0.1, 0.1)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.5], std=[0.5])
-    ])
+    torch.manual_seed(seed)
     
     # Create dataset and dataloader
-    dataset = HandwritingDataset(image_dir, labels_file, transform=transform)
+    dataset = build_dataset(image_dir, labels_file, input_size, cache_dir, pipeline)
     
     if len(dataset) == 0:
         print("No training data found. Please provide training images and labels file.")
@@ -76,27 +239,71 @@ def train_model(image_dir, labels_file, epochs=10, batch_size=32, model_save_pat
         print("  - labels_file: CSV file with format 'filename.jpg,label_index'")
         return
     
-    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+    train_indices, val_indices = split_indices(len(dataset), val_split, seed)
+    sampler = ResumableRandomSampler(train_indices, seed)
+    val_loader = None
+    if val_indices:
+        # Validation images are not augmented
+        val_dataset = build_dataset(image_dir, labels_file, input_size, cache_dir, pipeline='eval')
+        val_loader = build_dataloader(Subset(val_dataset, val_indices), batch_size, shuffle=False)
     
     # Initialize model
-    model = HandwritingBehaviorCNN().to(device)
+    model = build_model(arch).to(device)
     
     # Loss function and optimizer
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=0.001)
     scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=5, gamma=0.1)
     
+    # Resume from the last checkpoint if there is one
+    state_path = os.path.join(checkpoint_dir, 'last.pt') if checkpoint_dir else None
+    start_epoch, start_batch = 0, 0
+    running = {'loss': 0.0, 'correct': 0, 'total': 0, 'batches': 0}
+    best = {'val_loss': float('inf'), 'epochs_without_improvement': 0, 'state_dict': None}
+    # The labels file and every listed image's size/mtime, so a new dataset never resumes an old run
+    run_config = {'arch': arch, 'input_size': input_size, 'images': len(dataset),
+                  'sources': source_fingerprint(image_dir, labels_file, input_size),
+                  'val_split': val_split, 'batch_size': batch_size, 'seed': seed}
+    state = None
+    if state_path and resume and os.path.exists(state_path):
+        state = torch.load(state_path, map_location=device, weights_only=False)
+        if state.get('config') != run_config:
+            print(f"Ignoring {state_path}: it was written for a different dataset or configuration")
+            state = None
+    if state is not None:
+        model.load_state_dict(state['model'])
+        optimizer.load_state_dict(state['optimizer'])
+        scheduler.load_state_dict(state['scheduler'])
+        start_epoch, start_batch = state['epoch'], state['batch']
+        running, best = state['running'], state['best']
+        set_rng_state(state['rng'])
+        print(f"Resumed from {state_path} at epoch {start_epoch+1}, batch {start_batch}")
+
+    def checkpoint(epoch, batch):
+        if state_path:
+            save_training_state(state_path, {
+                'config': run_config,
+                'model': model.state_dict(), 'optimizer': optimizer.state_dict(),
+                'scheduler': scheduler.state_dict(), 'epoch': epoch, 'batch': batch,
+                'running': running, 'best': best, 'rng': rng_state()
+            })
+    
     # Training loop
-    print(f"Starting training with {len(dataset)} images...")
+    print(f"Starting training with {len(train_indices)} images ({arch} architecture, {input_size}x{input_size} input)...")
     
-    for epoch in range(epochs):
+    for epoch in range(start_epoch, epochs):
         model.train()
-        total_loss = 0.0
-        correct = 0
-        total = 0
+        sampler.set_epoch(epoch, start_batch * batch_size)
+        # A loader per epoch whose worker seeds depend only on (seed, epoch), so a
+        # resumed run gives its workers the same seeds as an uninterrupted one
+        epoch_seed = int(np.random.SeedSequence([seed, epoch]).generate_state(1)[0])
+        dataloader = build_dataloader(dataset, batch_size, num_workers, prefetch_factor, sampler=sampler,
+                                      seed=epoch_seed, persistent_workers=False)
         
-        for batch_idx, (images, labels) in enumerate(dataloader):
-            images, labels = images.to(device), labels.to(device)
+        for batch_idx, (images, labels) in enumerate(dataloader, start=start_batch):
+            images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+            if pipeline == 'batched':
+                images = batch_augment(images)
             
             # Forward pass
             optimizer.zero_grad()
@@ -108,36 +315,99 @@ def train_model(image_dir, labels_file, epochs=10, batch_size=32, model_save_pat
             optimizer.step()
             
             # Statistics
-            total_loss += loss.item()
+            running['loss'] += loss.item()
+            running['batches'] += 1
             _, predicted = outputs.max(1)
-            total += labels.size(0)
-            correct += predicted.eq(labels).sum().item()
+            running['total'] += labels.size(0)
+            running['correct'] += predicted.eq(labels).sum().item()
             
             if (batch_idx + 1) % 10 == 0:
                 print(f"Epoch {epoch+1}/{epochs}, Batch {batch_idx+1}, Loss: {loss.item():.4f}")
+            
+            if checkpoint_every and (batch_idx + 1) % checkpoint_every == 0:
+                checkpoint(epoch, batch_idx + 1)
         
+        start_batch = 0
         scheduler.step()
         
-        avg_loss = total_loss / len(dataloader)
-        accuracy = 100. * correct / total
+        avg_loss = running['loss'] / max(1, running['batches'])
+        accuracy = 100. * running['correct'] / max(1, running['total'])
+        running = {'loss': 0.0, 'correct': 0, 'total': 0, 'batches': 0}
+        
+        message = f"Epoch {epoch+1}/{epochs} - Loss: {avg_loss:.4f}, Accuracy: {accuracy:.2f}%"
+        stop = False
+        if val_loader is not None:
+            val_loss, val_accuracy = evaluate(model, val_loader, criterion, device)
+            message += f", Val Loss: {val_loss:.4f}, Val Accuracy: {val_accuracy:.2f}%"
+            if val_loss < best['val_loss']:
+                best['val_loss'] = val_loss
+                best['epochs_without_improvement'] = 0
+                best['state_dict'] = {k: v.detach().cpu().clone() for k, v in model.state_dict().items()}
+            else:
+                best['epochs_without_improvement'] += 1
+                stop = patience > 0 and best['epochs_without_improvement'] >= patience
+        print(message)
         
-        print(f"Epoch {epoch+1}/{epochs} - Loss: {avg_loss:.4f}, Accuracy: {accuracy:.2f}%")
+        checkpoint(epoch + 1, 0)
+        if stop:
+            print(f"Early stopping: no validation improvement for {patience} epochs")
+            break
+    
+    # Keep the weights with the best validation loss
+    if best['state_dict'] is not None:
+        model.load_state_dict(best['state_dict'])
     
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(model_save_path) if os.path.dirname(model_save_path) else '.', exist_ok=True)
     
-    # Save model
-    torch.save(model.state_dict(), model_save_path)
+    # Save model with its architecture so load_model can rebuild it
+    save_checkpoint(model, model_save_path, arch, input_size)
     print(f"Model saved to {model_save_path}")
     
+    # The run is complete; the next training run starts from scratch
+    if state_path and os.path.exists(state_path):
+        os.remove(state_path)
+    
     return model
 
 if __name__ == '__main__':
     # Example usage
+    parser = argparse.ArgumentParser(description='Train the handwriting behavior CNN')
+    parser.add_argument('--arch', choices=list(ARCHITECTURES), default='baseline')
+    parser.add_argument('--input-size', type=int, default=None)
+    parser.add_argument('--cache-dir', default=None, help='preprocessed memory-mapped training cache')
+    parser.add_argument('--pipeline', choices=['per_image', 'batched'], default='per_image',
+                        help='augment each image in the dataset, or whole batches in the training loop')
+    parser.add_argument('--num-workers', type=int, default=0)
+    parser.add_argument('--prefetch-factor', type=int, default=2)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--checkpoint-dir', default='models/checkpoints', help='resumable training state')
+    parser.add_argument('--checkpoint-every', type=int, default=0,
+                        help='also checkpoint every N batches; with --num-workers > 0 and per-image augmentation, '
+                             'a run resumed mid-epoch restarts the worker random streams, so the rest of that '
+                             'epoch is augmented differently than in an uninterrupted run')
+    parser.add_argument('--no-resume', action='store_true', help='ignore an existing checkpoint')
+    parser.add_argument('--val-split', type=float, default=0.1, help='fraction held out for validation')
+    parser.add_argument('--patience', type=int, default=3, help='early-stopping patience in epochs (0 disables)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
     train_model(
         image_dir='datasets/training_images',
         labels_file='datasets/labels.csv',
-        epochs=10,
+        epochs=args.epochs,
         batch_size=32,
-        model_save_path='models/handwriting_model.pth'
+        model_save_path='models/handwriting_model.pth',
+        arch=args.arch,
+        input_size=args.input_size,
+        cache_dir=args.cache_dir,
+        pipeline=args.pipeline,
+        num_workers=args.num_workers,
+        prefetch_factor=args.prefetch_factor,
+        checkpoint_dir=args.checkpoint_dir,
+        checkpoint_every=args.checkpoint_every,
+        resume=not args.no_resume,
+        val_split=args.val_split,
+        patience=args.patience,
+        seed=args.seed
     )
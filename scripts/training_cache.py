@@ -0,0 +1,147 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+INDEX_FILE = 'index.json'
+
+def read_labels(labels_file):
+    """Parse a 'filename,label_index' labels file"""
+    entries = []
+    with open(labels_file, 'r') as f:
+        for line in f:
+            if line.strip():
+                img_file, label = line.strip().split(',')
+                entries.append((img_file, int(label)))
+    return entries
+
+def source_fingerprint(image_dir, labels_file, input_size):
+    """Hash of the labels file, every listed image's size/mtime and the target size"""
+    digest = hashlib.sha1(f'{input_size}'.encode())
+    with open(labels_file, 'rb') as f:
+        digest.update(f.read())
+    for img_file, _ in read_labels(labels_file):
+        try:
+            stat = os.stat(os.path.join(image_dir, img_file))
+            digest.update(f'{img_file}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        except OSError:
+            digest.update(f'{img_file}:missing'.encode())
+    return digest.hexdigest()
+
+def build_cache(image_dir, labels_file, cache_dir, input_size=224):
+    """Decode, grayscale and resize every image once into memory-mapped shards.
+
+    Writes images.npy (N x S x S uint8), labels.npy, valid.npy and an
+    index.json carrying the source fingerprint. The cache is built in a
+    temporary directory and swapped in, so readers never see a partial one.
+    """
+    # Fingerprint the sources before reading them: a file changed mid-build
+    # then leaves a stale fingerprint that triggers a rebuild, never a fresh
+    # one over old pixels
+    fingerprint = source_fingerprint(image_dir, labels_file, input_size)
+    entries = read_labels(labels_file)
+    tmp_dir = f'{cache_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    images = np.lib.format.open_memmap(os.path.join(tmp_dir, 'images.npy'), mode='w+',
+                                       dtype=np.uint8, shape=(len(entries), input_size, input_size))
+    valid = np.zeros(len(entries), dtype=bool)
+    for i, (img_file, _) in enumerate(entries):
+        img_path = os.path.join(image_dir, img_file)
+        try:
+            with Image.open(img_path) as image:
+                image.draft('L', (input_size, input_size))
+                images[i] = np.asarray(image.convert('L').resize((input_size, input_size), Image.BILINEAR))
+            valid[i] = True
+        except Exception as e:
+            print(f"Error loading image {img_path}: {e}")
+    images.flush()
+    del images
+
+    np.save(os.path.join(tmp_dir, 'labels.npy'), np.array([label for _, label in entries], dtype=np.int64))
+    np.save(os.path.join(tmp_dir, 'valid.npy'), valid)
+    with open(os.path.join(tmp_dir, INDEX_FILE), 'w') as f:
+        json.dump({
+            'fingerprint': fingerprint,
+            'count': len(entries),
+            'input_size': input_size,
+            'files': [img_file for img_file, _ in entries]
+        }, f)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+def ensure_cache(image_dir, labels_file, cache_dir, input_size=224):
+    """Build the cache if it is missing or its sources or labels changed"""
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        if index.get('fingerprint') == source_fingerprint(image_dir, labels_file, input_size):
+            return cache_dir
+        print(f"Training cache {cache_dir} is stale, rebuilding...")
+    else:
+        print(f"Building training cache in {cache_dir}...")
+    return build_cache(image_dir, labels_file, cache_dir, input_size)
+
+class CachedHandwritingDataset(Dataset):
+    """Reads preprocessed images straight from the memory-mapped shards.
+
+    Samples are zero-copy views into the page cache; only the per-epoch
+    random augmentations in `transform` (applied to uint8 1xSxS tensors)
+    and the final float conversion run per item.
+    """
+
+    def __init__(self, cache_dir, transform=None):
+        self.cache_dir = cache_dir
+        self.transform = transform
+        with open(os.path.join(cache_dir, INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        self.labels = np.load(os.path.join(cache_dir, 'labels.npy'))
+        self.valid = np.load(os.path.join(cache_dir, 'valid.npy'))
+        self._images = None
+
+    def __getstate__(self):
+        # Each DataLoader worker maps the shard itself instead of pickling it
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+    @property
+    def images(self):
+        if self._images is None:
+            # Copy-on-write mapping: writable views without touching the file
+            self._images = np.load(os.path.join(self.cache_dir, 'images.npy'), mmap_mode='c')
+        return self._images
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        label = torch.tensor(self.labels[idx], dtype=torch.long)
+        if not self.valid[idx]:
+            size = self.index['input_size']
+            return torch.zeros((1, size, size)), label
+
+        image = torch.from_numpy(self.images[idx]).unsqueeze(0)
+        if self.transform:
+            image = self.transform(image)
+        # uint8 [0, 255] -> normalized float, matching ToTensor + Normalize(0.5, 0.5)
+        return image.float().div_(127.5).sub_(1.0), label
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the preprocessed training cache')
+    parser.add_argument('--image-dir', default='datasets/training_images')
+    parser.add_argument('--labels-file', default='datasets/labels.csv')
+    parser.add_argument('--cache-dir', default='datasets/cache')
+    parser.add_argument('--input-size', type=int, default=224)
+    args = parser.parse_args()
+
+    ensure_cache(args.image_dir, args.labels_file, args.cache_dir, args.input_size)